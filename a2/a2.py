@@ -5,6 +5,8 @@ from a2_support import *
 class Tile(object):
     """An abstract class from which all instantiable types of tiles inherit."""
 
+    __slots__ = ()
+
     def is_blocking(self) -> bool:
         """Returns True only when this tile is blocking.
         A tile is blocking if an entity would not be able to move onto that tile.
@@ -34,6 +36,8 @@ class Floor(Tile):
     and is represented by a single space character.
     """
 
+    __slots__ = ()
+
     def is_blocking(self) -> bool:
         """Returns False only when the floor is not blocking"""
         return False
@@ -51,6 +55,8 @@ class Wall(Tile):
     and are represented by the character ‘W’.
     """
 
+    __slots__ = ()
+
     def is_blocking(self) -> bool:
         """Returns True because wall blocks everything by default"""
         return True
@@ -74,6 +80,8 @@ class Goal(Tile):
     to denote that this goal tile is filled.
     """
 
+    __slots__ = ('_place',)
+
     def __init__(self) -> None:
         """use a value self._place to show goal not realized"""
         self._place = False
@@ -109,6 +117,8 @@ class Entity:
        Entities may or may not be movable.Abstract base class from which all entities inherit.
     """
 
+    __slots__ = ()
+
     def __init__(self):
         """ the __init__ method doesn't take any arguments."""
         pass
@@ -142,6 +152,8 @@ class Crate(Entity):
     The string representation of a crate should be the string version of its strength value.
     """
 
+    __slots__ = ('_strength',)
+
     def __init__(self, strength: int):
         """create self._strength show how much strength the crate is required """
         super().__init__()
@@ -178,6 +190,8 @@ class Potion(Entity):
     and has no effect.
     """
 
+    __slots__ = ()
+
     def effect(self) -> dict[str, int]:
         """The method returns an empty dictionary, since it has no effect"""
         return {}
@@ -193,6 +207,8 @@ class StrengthPotion(Potion):
     A StrengthPotion is represented by the string ‘S’ and provides the player with an additional 2 strength.
     """
 
+    __slots__ = ()
+
     def get_type(self) -> str:
         """return strength potion"""
         return STRENGTH_POTION
@@ -208,6 +224,8 @@ class MovePotion(Potion):
     A MovePotion is represented by the string ‘M’ and provides the player with an additional 5 moves.
     """
 
+    __slots__ = ()
+
     def get_type(self) -> str:
         """return move_potion"""
         return MOVE_POTION
@@ -223,6 +241,8 @@ class FancyPotion(Potion):
     A FancyPotion is represented by the string ‘F’ and provides the player with 3 strength and 3 moves.
     """
 
+    __slots__ = ()
+
     def get_type(self) -> str:
         """return fancy_potion """
         return FANCY_POTION
@@ -243,6 +263,8 @@ class Player(Entity):
 
     """
 
+    __slots__ = ('_strength', '_moves')
+
     def __init__(self, start_strength: int, moves_remaining: int) -> None:
         """Initializes a Player object with the given initial strength and moves remaining.
         Args:
@@ -308,6 +330,17 @@ class Player(Entity):
             self.add_moves_remaining(potion_effect['moves'])
 
 
+# Floors, walls and potions hold no state of their own, so every cell of that
+# kind shares one instance instead of creating a new object per cell
+SHARED_FLOOR = Floor()
+SHARED_WALL = Wall()
+SHARED_POTIONS = {
+    STRENGTH_POTION: StrengthPotion(),
+    MOVE_POTION: MovePotion(),
+    FANCY_POTION: FancyPotion(),
+}
+
+
 def convert_maze(game: list[list[str]]) -> tuple[Grid, Entity, Position]:
     """Converts a game represented as a 2D list of strings into a maze, entity dictionary, and player position.
         Args:
@@ -338,39 +371,21 @@ def convert_maze(game: list[list[str]]) -> tuple[Grid, Entity, Position]:
         # find every cell in the row using for loop
         for cell in row:
 
-            # if the cell is a wall, create a new wall 'W', insert 'W' to maze_tiles list
+            # if the cell is a wall, insert the shared wall 'W' to maze_tiles list
             if cell == WALL:
-                tile_wall = Wall()
-                maze_tiles.append(tile_wall)
+                maze_tiles.append(SHARED_WALL)
 
-            # if the cell is a floor, create a new floor 'F', insert 'F' to maze_tiles list
+            # if the cell is a floor, insert the shared floor to maze_tiles list
             if cell == FLOOR:
-                tile_floor = Floor()
-                maze_tiles.append(tile_floor)
-
-            # if the entity is a potion, create a new potion and insert it to entities with its position
-            if cell == STRENGTH_POTION:
-                entity_potion = StrengthPotion()
-                entity_position = (i, j)  # get potion position
-                entities[entity_position] = entity_potion
-                tile_floor = Floor()  # below the potion is a floor, append floor to the maze list
-                maze_tiles.append(tile_floor)
-
-            if cell == FANCY_POTION:
-                entity_potion = FancyPotion()
-                entity_position = (i, j)
-                entities[entity_position] = entity_potion
-                tile_floor = Floor()
-                maze_tiles.append(tile_floor)
-
-            if cell == MOVE_POTION:
-                entity_potion = MovePotion()
-                entity_position = (i, j)
-                entities[entity_position] = entity_potion
-                tile_floor = Floor()
-                maze_tiles.append(tile_floor)
+                maze_tiles.append(SHARED_FLOOR)
+
+            # if the entity is a potion, insert the shared potion to entities with its position
+            if cell in SHARED_POTIONS:
+                entities[(i, j)] = SHARED_POTIONS[cell]
+                maze_tiles.append(SHARED_FLOOR)  # below the potion is a floor, append floor to the maze list
 
             # if the cell is a goal, create a new goal and append it to maze tile list
+            # goals can be filled, so each goal needs its own instance
             if cell == GOAL:
                 tile_goal = Goal()
                 maze_tiles.append(tile_goal)
@@ -386,14 +401,12 @@ def convert_maze(game: list[list[str]]) -> tuple[Grid, Entity, Position]:
                 entity_crate.is_movable()  # make crate movable because by default the crate is unmovable
                 crate_position = (i, j)
                 entities[crate_position] = entity_crate
-                tile_floor = Floor()
-                maze_tiles.append(tile_floor)
+                maze_tiles.append(SHARED_FLOOR)
 
             # if the cell is a player, record its position
             if cell == PLAYER:
                 player_position = (i, j)
-                tile_floor = Floor()
-                maze_tiles.append(tile_floor)
+                maze_tiles.append(SHARED_FLOOR)
 
             j += 1
         i += 1
@@ -414,6 +427,12 @@ class SokobanModel:
            self._strength (int): The initial strength of the player.
            self._moves (int): The initial number of moves remaining for the player.
            self._player (Player): The player instance representing the player character in the game.
+           self._maze_height (int): The number of rows in the maze.
+           self._maze_width (int): The number of columns in the maze.
+           self._move_targets (dict): Maps (position, direction) to the position a move lands on, or None.
+           self._push_targets (dict): Maps (position, direction) to the position a pushed crate lands on, or None.
+           self._goal_count (int): The total number of goals in the maze.
+           self._unfilled_goals (int): The number of goals which are not filled yet.
 
            self._maze_undo (Grid): The previous game grid before any change.
            self._entities_undo (Entities): A dictionary saves entities with their positions before any change.
@@ -444,6 +463,37 @@ class SokobanModel:
         self._moves = player_stats[1]
         self._player = Player(player_stats[0], player_stats[1])
 
+        # the maze never changes size, so measure it once here instead of on every move
+        self._maze_height = len(maze)
+        self._maze_width = len(maze[0])
+
+        # the tiles never change either, so for every open cell and direction, find once here
+        # the cell a move lands on and the cell a pushed crate lands on (None if that is a wall
+        # or outside the maze), so attempt_move only needs to look them up
+        self._move_targets = {}
+        self._push_targets = {}
+        for x in range(self._maze_height):
+            for y in range(self._maze_width):
+                if maze[x][y].is_blocking():
+                    continue
+                for direction, (dx, dy) in DIRECTION_DELTAS.items():
+                    move_target = self._open_cell(x + dx, y + dy)
+                    self._move_targets[((x, y), direction)] = move_target
+                    if move_target is None:  # nothing can be pushed through a wall
+                        self._push_targets[((x, y), direction)] = None
+                    else:
+                        self._push_targets[((x, y), direction)] = self._open_cell(x + 2 * dx, y + 2 * dy)
+
+        # count the goals once here, so has_won does not need to scan the maze
+        self._goal_count = 0
+        self._unfilled_goals = 0
+        for row in maze:
+            for tile in row:
+                if tile.get_type() == GOAL:
+                    self._goal_count += 1
+                    if not tile.is_filled():  # if the goal is not filled
+                        self._unfilled_goals += 1
+
         self.undo_stack = []  # a list storing previous elements
         self.maze_undo = maze
         self.entities_undo = entities
@@ -452,6 +502,17 @@ class SokobanModel:
         self.moves_undo = player_stats[1]
         self.player_undo = Player(player_stats[0], player_stats[1])
 
+    def _open_cell(self, x: int, y: int) -> Position | None:
+        """Returns the position (x, y) if it is inside the maze and not blocking, otherwise None.
+
+        Args:
+        x (int): The row of the position.
+        y (int): The column of the position.
+        """
+        if 0 <= x < self._maze_height and 0 <= y < self._maze_width and not self._maze[x][y].is_blocking():
+            return x, y
+        return None
+
     def get_entities(self) -> Entities:
         """Returns the dictionary of entities and their positions."""
         return self._entities
@@ -497,25 +558,13 @@ class SokobanModel:
         player_strength = self.get_player_strength()
         player_moves = self.get_player_moves_remaining()
 
-        # movement (tuple[int, int]): The coordinate deltas for the specified movement direction.
-        movement = DIRECTION_DELTAS[direction]
-
-        # position_next_move: The next position of the player after the move.
-        position_next_move = (position_player[0] + movement[0], position_player[1] + movement[1])
-        x, y = position_next_move  # x is row and y is column
+        # Fetch the maze
+        maze = self._maze
 
-        # Fetch maze dimensions
-        maze = self.get_maze()
-        maze_height = len(maze)
-        maze_width = len(maze[0])
-
-        # Check if the potential move is within the maze boundary
-        if y >= maze_height or x >= maze_width:
-            return False
-
-        # Check if the potential move is blocked by maze tiles
-        maze_tile = self.get_maze()[x][y]
-        if maze_tile.is_blocking():
+        # position_next_move: The next position of the player after the move, from the table built in __init__.
+        # It is None if the move would leave the maze or is blocked by maze tiles
+        position_next_move = self._move_targets[(position_player, direction)]
+        if position_next_move is None:
             return False
 
         # Store all entities in a dictionary
@@ -529,22 +578,17 @@ class SokobanModel:
             if entity_object.get_type() == CRATE:
                 crate_strength = entity_object.get_strength()  # The strength of the crate
 
-                # position_crate_move: The potential new position of the crate if the carte be pushed by player
-                position_crate_move = (position_next_move[0] + movement[0], position_next_move[1] + movement[1])
+                # position_crate_move: The potential new position of the crate if the carte be pushed by player.
+                # It is None if the crate would leave the maze or is blocked by a wall
+                position_crate_move = self._push_targets[(position_player, direction)]
+                if position_crate_move is None:
+                    return False
 
                 # a,b coordinates of the potential new crate position
                 a, b = position_crate_move
 
-                # Check if the crate move is within the maze boundary
-                if a >= maze_height or b >= maze_width:
-                    return False
-
                 # The new tile which will be occupied by crate in the next move
-                maze_tile_new = self.get_maze()[a][b]
-
-                # if the tile is a wall return False if not return True
-                if maze_tile_new.is_blocking():
-                    return False
+                maze_tile_new = maze[a][b]
 
                 # return False if the strength of player is less than the crate
                 if player_strength < crate_strength:
@@ -572,6 +616,10 @@ class SokobanModel:
                 # if the tile at the new position is a GOAL
                 if maze_tile_new.get_type() == GOAL:
 
+                    # one less goal to fill if this goal was still unfilled
+                    if not maze_tile_new.is_filled():
+                        self._unfilled_goals -= 1
+
                     # fill the goal, turn 'G' to 'X'
                     maze_tile_new.fill()
 
@@ -624,16 +672,8 @@ class SokobanModel:
         """ Checks if the player has won the game by completing all goals
         Returns True if the player has won, False otherwise
         """
-        #  store all the unfilled goal in a list
-        goals = []
-        for i in self.get_maze():
-            for j in i:
-                if j.get_type() == GOAL:
-                    if not j.is_filled():  # if the goal is not filled
-                        goals.append(j)
-
         # return True if there are no unfilled goal which means all goals are filled
-        if len(goals) == 0:
+        if self._unfilled_goals == 0:
             return True
 
         return False
@@ -661,6 +701,9 @@ class SokobanModel:
                 if j.get_type() == GOAL:
                     j.unfill()
 
+        # every goal is unfilled now
+        self._unfilled_goals = self._goal_count
+
         # assign the values of last step to attributes
         self._player_position = last_state['_player_position']
         self._strength = last_state['_strength']
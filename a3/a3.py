@@ -2,13 +2,16 @@ import tkinter as tk
 import tkinter.messagebox
 from tkinter import messagebox, filedialog
 from typing import Callable
-from model import SokobanModel, Tile, Entity
+from model import SokobanModel, Tile, Entity, UNDO, REDO
+from hint_agent import HintAgent
 from a2_support import *
 from a3_support import *
 
 # Write your classes and functions here
 COIN = '$'
 COIN_AMOUNT = 5
+HINT = 'h'
+HINT_BUDGET = 0.1  # seconds spent searching for each hint
 
 
 class FancyGameView(AbstractGrid):
@@ -28,78 +31,116 @@ class FancyGameView(AbstractGrid):
         super().__init__(master, dimensions, size)
         self._images = dict()  # create a cache to store images
 
-    def display(self, maze: Grid, entities: Entities, player_position: Position) -> None:
+        # Walls, floors and goals are pasted into one background image, shown
+        # as a single canvas item. _tile_types maps each position to the tile
+        # type in the background, so only goals which flip are pasted again.
+        self._tile_images = dict()  # cache of tile images to paste
+        self._background = None
+        self._background_photo = None
+        self._tile_types = {}
+
+        # Entity and player items are kept between frames and updated in place.
+        # _entity_items maps positions which have held an entity to its
+        # (image, crate text) items.
+        self._entity_items = {}
+        self._player_item = None
+
+    def display(self, maze: Grid, entities: Entities, player_position: Position,
+                changed: set[Position] | None = None) -> None:
         """
         :param maze: a 2D list maze grid containing tiles
         :param entities: a dictionary where key is position and value is entity
         :param player_position: the tuple of player position
+        :param changed: the positions which changed since the last display, as
+                        returned by SokobanModel.pop_changed_cells, or None to
+                        redraw every cell
         :return: none
-        get every element in maze and entities and get type respectively, then use get_image
-        method to render them on the canvas
+        update the background and canvas items of the changed cells to show their tiles
+        and entities, building the background on the first display
   """
-        self.clear()  # Clears all child widgets off the canvas.
-
-        '''use for loop to fetch all the tiles in maze'''
-        for i, row in enumerate(maze):
-            for j, tile_type in enumerate(row):
-                tile = maze[i][j]  # get tile in maze
-                tile_type = str(tile)  # check what type the tile is
-
-                if tile_type == FLOOR:
-                    image_floor = get_image("images/Floor.png", self.get_cell_size(), self._images)
-                    x, y = self.get_midpoint((i, j))
-                    self.create_image(x, y, image=image_floor)
-
-                if tile_type == WALL:
-                    image_wall = get_image("images/W.png", self.get_cell_size(), self._images)
-                    x, y = self.get_midpoint((i, j))
-                    self.create_image(x, y, image=image_wall)
-
-                if tile_type == GOAL:
-                    image_goal = get_image("images/G.png", self.get_cell_size(), self._images)
-                    x, y = self.get_midpoint((i, j))
-                    self.create_image(x, y, image=image_goal)
-
-                if tile_type == FILLED_GOAL:
-                    image_filled_goal = get_image("images/X.png", self.get_cell_size(), self._images)
-                    x, y = self.get_midpoint((i, j))
-                    self.create_image(x, y, image=image_filled_goal)
-
-        '''use for loop to fetch all the entities and their positions in entities'''
-        for entity_position, entity in entities.items():  # entities: {(1,1): Crater(5), (1,2): FancyPotion()}
-            entity_type = entity.get_type()
-
-            if entity_type == CRATE:
-                crate_strength = entity.get_strength()
-                image_crate = get_image("images/C.png", self.get_cell_size(), self._images)
-                crate_x, crate_y = self.get_midpoint(entity_position)
-                self.create_image(crate_x, crate_y, image=image_crate)
-                self.create_text(crate_x, crate_y - 20, text=crate_strength, font=CRATE_FONT)
-
-            if entity_type == COIN:
-                image_coin = get_image("images/$.png", self.get_cell_size(), self._images)
-                coin_x, coin_y = self.get_midpoint(entity_position)
-                self.create_image(coin_x, coin_y, image=image_coin)
-
-            if entity_type == STRENGTH_POTION:
-                image_strength_potion = get_image("images/S.png", self.get_cell_size(), self._images)
-                potion_x, potion_y = self.get_midpoint(entity_position)
-                self.create_image(potion_x, potion_y, image=image_strength_potion)
-
-            if entity_type == MOVE_POTION:
-                image_move_potion = get_image("images/M.png", self.get_cell_size(), self._images)
-                potion_x, potion_y = self.get_midpoint(entity_position)
-                self.create_image(potion_x, potion_y, image=image_move_potion)
-
-            if entity_type == FANCY_POTION:
-                image_fancy_potion = get_image("images/F.png", self.get_cell_size(), self._images)
-                potion_x, potion_y = self.get_midpoint(entity_position)
-                self.create_image(potion_x, potion_y, image=image_fancy_potion)
-
-        '''render player image based on its position on maze'''
-        image_player = get_image("images/P.png", self.get_cell_size(), self._images)
+        if changed is None or self._background is None:
+            self.clear()  # Clears all child widgets off the canvas.
+            self._entity_items = {}
+
+            # paste every tile in maze into a new background
+            cell_width, cell_height = self.get_cell_size()
+            self._background = Image.new('RGB', (len(maze[0]) * cell_width, len(maze) * cell_height))
+            self._tile_types = {}
+            for i, row in enumerate(maze):
+                for j, tile in enumerate(row):
+                    self._paste_tile((i, j), str(tile))
+            self._background_photo = ImageTk.PhotoImage(self._background)
+            self.create_image(0, 0, image=self._background_photo, anchor=tk.NW)
+
+            # the player is moved between cells rather than redrawn
+            self._player_item = self.create_image(0, 0, image=self._get_image(PLAYER))
+            changed = self._tile_types.keys()
+
+        # a goal which has been filled or emptied is pasted again, and the
+        # background shown on the canvas is refreshed once for all of them
+        flipped = False
+        for position in changed:
+            row, col = position
+            tile_type = str(maze[row][col])
+            if self._tile_types[position] != tile_type:
+                self._paste_tile(position, tile_type)
+                flipped = True
+            self._draw_entity(position, entities)
+        if flipped:
+            self._background_photo.paste(self._background)
+
+        # render player image based on its position on maze
         x, y = self.get_midpoint(player_position)
-        self.create_image(x, y, image=image_player)
+        self.coords(self._player_item, x, y)
+
+    def _paste_tile(self, position: Position, tile_type: str) -> None:
+        """
+        :param position: the position of the cell to paste
+        :param tile_type: the type of tile at the position, e.g. WALL or FILLED_GOAL
+        :return: none
+        paste the image of the tile into the background at the position
+        """
+        if tile_type not in self._tile_images:
+            image_name = "images/Floor.png" if tile_type == FLOOR else f"images/{tile_type}.png"
+            self._tile_images[tile_type] = Image.open(image_name).convert('RGB').resize(self.get_cell_size())
+        self._background.paste(self._tile_images[tile_type], self.get_bbox(position)[:2])
+        self._tile_types[position] = tile_type
+
+    def _draw_entity(self, position: Position, entities: Entities) -> None:
+        """
+        :param position: the position of the cell to draw
+        :param entities: a dictionary where key is position and value is entity
+        :return: none
+        show the entity at the position if there is one, or hide its items if not
+        """
+        entity = entities.get(position)
+        items = self._entity_items.get(position)
+        if entity is None:
+            if items is not None:  # hide the items of an entity which has gone
+                self.itemconfig(items[0], state=tk.HIDDEN)
+                self.itemconfig(items[1], state=tk.HIDDEN)
+            return
+
+        if items is None:  # the first entity on this cell, create its items under the player
+            x, y = self.get_midpoint(position)
+            items = (self.create_image(x, y), self.create_text(x, y - 20, font=CRATE_FONT))
+            self.tag_lower(items[1], self._player_item)
+            self.tag_lower(items[0], items[1])
+            self._entity_items[position] = items
+
+        entity_type = entity.get_type()
+        self.itemconfig(items[0], image=self._get_image(entity_type), state=tk.NORMAL)
+        if entity_type == CRATE:  # crates show the strength needed to push them
+            self.itemconfig(items[1], text=entity.get_strength(), state=tk.NORMAL)
+        else:
+            self.itemconfig(items[1], state=tk.HIDDEN)
+
+    def _get_image(self, image_id: str) -> ImageTk.PhotoImage:
+        """
+        :param image_id: the type of an entity or the player, e.g. CRATE or PLAYER
+        :return: the cached image for that type, sized to fit a cell
+        """
+        return get_image(f"images/{image_id}.png", self.get_cell_size(), self._images)
 
 
 class FancyStatsView(AbstractGrid):
@@ -223,7 +264,8 @@ class FancySokobanView:
         self.maze_stats = FancyStatsView(frame_stats)
         self.maze_stats.pack()
 
-    def display_game(self, maze: Grid, entities: Entities, player_position: Position):
+    def display_game(self, maze: Grid, entities: Entities, player_position: Position,
+                     changed: set[Position] | None = None):
         """
         Display the current game state, including the maze layout, entities, and player's position.
 
@@ -231,12 +273,11 @@ class FancySokobanView:
         - maze (Grid): The current maze layout.
         - entities (Entities): All entities within the maze (e.g., monsters, items).
         - player_position (Position): The current position of the player in the maze.
+        - changed (set[Position] | None): The positions which changed since the last display,
+          or None to redraw the whole maze.
         """
-        # Clear the previous state from the maze view.
-        self.maze_view.clear()
-
-        # Render the new state of the maze.
-        self.maze_view.display(maze, entities, player_position)
+        # Render the new state of the maze, updating only the changed cells.
+        self.maze_view.display(maze, entities, player_position, changed)
 
     def display_stats(self, moves, strength, money):
         """
@@ -303,6 +344,10 @@ class ExtraFancySokoban:
         # Initialize the game model with the maze from the provided file.
         self.model = SokobanModel(maze_file)
 
+        # The hint agent is created on the first hint, and keeps its search
+        # tree between hints.
+        self._hint_agent = None
+
         # Create a view for the Sokoban game with the required dimensions and size.
         self.view = FancySokobanView(root, self.model.get_dimensions(), (MAZE_SIZE, MAZE_SIZE))
 
@@ -344,11 +389,13 @@ class ExtraFancySokoban:
         """
         Refresh and display the current game state.
         """
-        # Display the current maze, entities, and player's position.
+        # Display the current maze, entities, and player's position,
+        # redrawing only the cells which changed since the last redraw.
         self.view.display_game(
             self.model.get_maze(),
             self.model.get_entities(),
-            self.model.get_player_position()
+            self.model.get_player_position(),
+            self.model.pop_changed_cells()
         )
 
         # Display the player's remaining moves, strength, and money.
@@ -379,10 +426,34 @@ class ExtraFancySokoban:
                 self.redraw()
                 self.win_window()
 
-            elif self.model.get_player_moves_remaining() == 0:
+            elif (self.model.get_player_moves_remaining() == 0
+                  or self.model.is_deadlocked()):
                 self.redraw()
                 self.lose_window()
 
+        # Undo or redo any number of previous moves and purchases.
+        elif key_input in [UNDO, REDO]:
+            self.model.attempt_move(key_input)
+            self.redraw()
+
+        elif key_input == HINT:
+            self.show_hint()
+
+    def show_hint(self):
+        """
+        Suggest the next move or purchase to the player.
+        """
+        if self._hint_agent is None:
+            self._hint_agent = HintAgent(self.model)
+        hint = self._hint_agent.get_hint(self.model, HINT_BUDGET)
+
+        if hint is None:
+            messagebox.showinfo("Hint", message="No move can win from here.")
+        elif hint in self.model.get_shop_items():
+            messagebox.showinfo("Hint", message=f"Try buying {hint}.")
+        else:
+            messagebox.showinfo("Hint", message=f"Try moving {hint}.")
+
     def win_window(self):
         """
         Display a winning message and prompt the player to play again or exit.
@@ -0,0 +1,236 @@
+import numpy as np
+
+from a2_support import *
+from model import (COIN, COIN_AMOUNT, WALL_CODE, GOAL_CODE,
+                   ENTITY_IDS_TO_CLASS, SokobanModel, load_maze_template)
+
+# Action ids accepted by BatchSokobanModel.step. The first four are moves, the
+# rest are shop purchases.
+ACTIONS = (UP, DOWN, LEFT, RIGHT, STRENGTH_POTION, MOVE_POTION, FANCY_POTION)
+ACTION_IDS = {action: i for i, action in enumerate(ACTIONS)}
+NUM_MOVES = 4
+
+# Item codes used in the items array. Crates are kept in their own array.
+NO_ITEM = 0
+ITEM_CODES = {COIN: 1, STRENGTH_POTION: 2, MOVE_POTION: 3, FANCY_POTION: 4}
+CODE_TO_ITEM = {code: item for item, code in ITEM_CODES.items()}
+
+# Changes to strength, moves and money when the player picks up each item code
+ITEM_STRENGTH = np.zeros(len(ITEM_CODES) + 1, dtype=np.int64)
+ITEM_MOVES = np.zeros(len(ITEM_CODES) + 1, dtype=np.int64)
+ITEM_MONEY = np.zeros(len(ITEM_CODES) + 1, dtype=np.int64)
+ITEM_MONEY[ITEM_CODES[COIN]] = COIN_AMOUNT
+for _potion in (STRENGTH_POTION, MOVE_POTION, FANCY_POTION):
+    _effect = ENTITY_IDS_TO_CLASS[_potion].EFFECT
+    ITEM_STRENGTH[ITEM_CODES[_potion]] = _effect.get('strength', 0)
+    ITEM_MOVES[ITEM_CODES[_potion]] = _effect.get('moves', 0)
+
+# Cost and item code of each purchase action
+PURCHASE_COSTS = np.array([SokobanModel.ITEM_COSTS[item]
+                           for item in ACTIONS[NUM_MOVES:]])
+PURCHASE_CODES = np.array([ITEM_CODES[item] for item in ACTIONS[NUM_MOVES:]])
+
+NO_CRATE = -1
+
+
+class BatchSokobanModel:
+    """ A vectorised Sokoban model which steps many games in lockstep.
+
+    Every game is stored as a row of flat NumPy arrays, padded with a border of
+    walls to a common size, so one call to step applies one action to every
+    game without a Python loop over the games. The rules are the same as for
+    SokobanModel.attempt_move and SokobanModel.attempt_purchase.
+    """
+
+    def __init__(self, maze_files: list[str]) -> None:
+        """ Constructor for BatchSokobanModel.
+
+        Parameters:
+            maze_files: The path to the maze file for each game. The same path
+                        may be given any number of times, and is only parsed
+                        once.
+        """
+        templates = [load_maze_template(maze_file) for maze_file in maze_files]
+
+        # One border cell on every side means moves and pushes never leave
+        # the arrays, since out of bounds is always a wall.
+        rows = max(template.dimensions[0] for template in templates) + 2
+        cols = max(template.dimensions[1] for template in templates) + 2
+        self._dimensions = rows, cols
+        self._maze_dimensions = [template.dimensions for template in templates]
+        self._offsets = np.array([-cols, cols, -1, 1])
+
+        count = len(maze_files)
+        size = rows * cols
+        self._walls = np.ones((count, size), dtype=bool)
+        self._goals = np.zeros((count, size), dtype=bool)
+        self._filled = np.zeros((count, size), dtype=bool)
+        self._crates = np.full((count, size), NO_CRATE, dtype=np.int16)
+        self._items = np.zeros((count, size), dtype=np.int8)
+        self._player = np.zeros(count, dtype=np.int64)
+        self._strength = np.zeros(count, dtype=np.int64)
+        self._moves = np.zeros(count, dtype=np.int64)
+        self._money = np.zeros(count, dtype=np.int64)
+
+        for game, template in enumerate(templates):
+            filled = template.filled
+            for index, code in enumerate(template.tiles):
+                row, col = divmod(index, template.dimensions[1])
+                cell = (row + 1) * cols + col + 1
+                self._walls[game, cell] = code == WALL_CODE
+                self._goals[game, cell] = code == GOAL_CODE
+                self._filled[game, cell] = bool(
+                    filled[index >> 3] & (1 << (index & 7)))
+            for (row, col), entity in template.entities:
+                cell = (row + 1) * cols + col + 1
+                if entity.get_type() == CRATE:
+                    self._crates[game, cell] = entity.get_strength()
+                else:
+                    self._items[game, cell] = ITEM_CODES[entity.get_type()]
+            row, col = template.player_position
+            self._player[game] = (row + 1) * cols + col + 1
+            self._strength[game], self._moves[game] = template.player_stats
+
+        self._unfilled = (self._goals & ~self._filled).sum(axis=1)
+        self._games = np.arange(count)
+        self._initial = self._get_arrays()
+
+    def __len__(self) -> int:
+        """ Returns the number of games in the batch. """
+        return len(self._games)
+
+    def reset(self, mask: np.ndarray | None = None) -> None:
+        """ Resets games to their initial state.
+
+        Parameters:
+            mask: A boolean array selecting the games to reset. If None, every
+                    game is reset.
+        """
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+        for name, initial in self._initial.items():
+            getattr(self, name)[mask] = initial[mask]
+
+    def step(self, actions: np.ndarray) -> np.ndarray:
+        """ Applies one action to every game.
+
+        Parameters:
+            actions: An integer array with one action id (an index into
+                        ACTIONS) per game. Ids outside ACTIONS always fail.
+
+        Returns:
+            A boolean array which is True for each game whose action succeeded.
+        """
+        actions = np.asarray(actions)
+        games = self._games
+        valid = (actions >= 0) & (actions < len(ACTIONS))
+        is_move = valid & (actions < NUM_MOVES)
+
+        # Moves, including pushing a crate
+        offsets = self._offsets[np.clip(actions, 0, NUM_MOVES - 1)]
+        target = self._player + offsets
+        beyond = np.clip(target + offsets, 0, self._walls.shape[1] - 1)
+        crate = self._crates[games, target]
+        has_crate = crate != NO_CRATE
+        beyond_free = ~(self._walls[games, beyond]
+                        | (self._crates[games, beyond] != NO_CRATE)
+                        | (self._items[games, beyond] != NO_ITEM))
+        can_push = beyond_free & (crate <= self._strength)
+        moved = (is_move & ~self._walls[games, target]
+                 & (~has_crate | can_push))
+
+        pushed = moved & has_crate
+        fills = (pushed & self._goals[games, beyond]
+                 & ~self._filled[games, beyond])
+        self._crates[games[pushed], target[pushed]] = NO_CRATE
+        self._filled[games[fills], beyond[fills]] = True
+        lands = pushed & ~fills
+        self._crates[games[lands], beyond[lands]] = crate[lands]
+        self._unfilled -= fills
+
+        item = np.where(moved, self._items[games, target], NO_ITEM)
+        self._strength += ITEM_STRENGTH[item]
+        self._moves += ITEM_MOVES[item] - moved
+        self._money += ITEM_MONEY[item]
+        self._items[games[moved], target[moved]] = NO_ITEM
+        self._player = np.where(moved, target, self._player)
+
+        # Shop purchases
+        purchase = np.clip(actions - NUM_MOVES, 0, len(PURCHASE_COSTS) - 1)
+        cost = PURCHASE_COSTS[purchase]
+        bought = valid & ~is_move & (self._money >= cost)
+        bought_item = np.where(bought, PURCHASE_CODES[purchase], NO_ITEM)
+        self._money -= np.where(bought, cost, 0)
+        self._strength += ITEM_STRENGTH[bought_item]
+        self._moves += ITEM_MOVES[bought_item]
+
+        return moved | bought
+
+    def has_won(self) -> np.ndarray:
+        """ Returns a boolean array which is True for each game that is won. """
+        return self._unfilled == 0
+
+    def is_done(self) -> np.ndarray:
+        """ Returns a boolean array which is True for each game that is over,
+            because it is won or the player has no moves remaining.
+        """
+        return (self._unfilled == 0) | (self._moves <= 0)
+
+    def get_player_moves_remaining(self) -> np.ndarray:
+        """ Returns the moves remaining for the player in each game. """
+        return self._moves
+
+    def get_player_strength(self) -> np.ndarray:
+        """ Returns the player's strength in each game. """
+        return self._strength
+
+    def get_player_money(self) -> np.ndarray:
+        """ Returns the player's money in each game. """
+        return self._money
+
+    def get_player_position(self, game: int) -> Position:
+        """ Returns the player's (row, col) position in the given game, in the
+            coordinates of its maze file.
+
+        Parameters:
+            game: The index of the game in the batch.
+        """
+        row, col = divmod(int(self._player[game]), self._dimensions[1])
+        return row - 1, col - 1
+
+    def render(self, game: int) -> str:
+        """ Returns the given game as text, in the same format as the text
+            based SokobanView (without the trailing blank line).
+
+        Parameters:
+            game: The index of the game in the batch.
+        """
+        cols = self._dimensions[1]
+        maze_rows, maze_cols = self._maze_dimensions[game]
+        lines = []
+        for row in range(1, maze_rows + 1):
+            line = []
+            for cell in range(row * cols + 1, row * cols + maze_cols + 1):
+                if cell == self._player[game]:
+                    line.append(PLAYER)
+                elif self._crates[game, cell] != NO_CRATE:
+                    line.append(str(self._crates[game, cell]))
+                elif self._items[game, cell] != NO_ITEM:
+                    line.append(CODE_TO_ITEM[self._items[game, cell]])
+                elif self._walls[game, cell]:
+                    line.append(WALL)
+                elif self._goals[game, cell]:
+                    line.append(
+                        FILLED_GOAL if self._filled[game, cell] else GOAL)
+                else:
+                    line.append(FLOOR)
+            lines.append(''.join(line))
+        return '\n'.join(lines)
+
+    def _get_arrays(self) -> dict[str, np.ndarray]:
+        """ Returns copies of all the arrays holding per-game state, keyed by
+            attribute name.
+        """
+        return {name: getattr(self, name).copy() for name in (
+            '_filled', '_crates', '_items', '_player', '_strength', '_moves',
+            '_money', '_unfilled')}
@@ -0,0 +1,342 @@
+""" Benchmarks for the model, parser and rendering hot paths.
+
+Run from the a3 directory, e.g.
+    python benchmark.py --sizes 50 200 500 --output bench.json
+
+Every benchmark reports operations per second and the mean peak memory
+allocated by one operation, as JSON, so results can be compared between
+releases.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from a2_support import *
+from model import SokobanModel, build_maze_template, convert_maze
+
+SHIPPED_MAZES = ('maze_files/maze1.txt', 'maze_files/maze2.txt',
+                 'maze_files/maze3.txt', 'maze_files/coin_maze.txt')
+DEFAULT_SIZES = (50, 100, 200, 500)
+DEFAULT_MIN_TIME = 0.2
+ALLOCATION_SAMPLES = 20
+
+# Each benchmark is given a fresh setup and returns the operation to time. A
+# benchmark whose operation uses its setup up (e.g. undoing moves) instead
+# returns the operation and a function which, given a number of operations,
+# readies the setup for that many outside the timed region.
+Operation = Callable[[], object]
+Prepare = Callable[[int], object]
+Benchmark = Callable[[list[list[str]], list[int]],
+                     Operation | tuple[Operation, Prepare]]
+
+
+def synthetic_maze(size: int) -> tuple[list[list[str]], list[int]]:
+    """ Returns a square maze of the given size, in the format returned by
+        read_file. The maze is walled, with scattered walls, crates, goals,
+        potions and coins, and a clear top row used by the move benchmarks.
+
+    Parameters:
+        size: The number of rows and columns. Must be at least 6.
+    """
+    rng = random.Random(size)
+    maze = [[WALL] * size]
+    for row in range(1, size - 1):
+        cells = [WALL]
+        for col in range(1, size - 1):
+            roll = rng.random()
+            if row <= 2:
+                cells.append(FLOOR)
+            elif roll < 0.08:
+                cells.append(WALL)
+            elif roll < 0.10:
+                cells.append(str(rng.randint(1, 5)))
+            elif roll < 0.12:
+                cells.append(GOAL)
+            elif roll < 0.13:
+                cells.append(rng.choice((STRENGTH_POTION, MOVE_POTION,
+                                         FANCY_POTION, '$')))
+            else:
+                cells.append(FLOOR)
+        cells.append(WALL)
+        maze.append(cells)
+    maze.append([WALL] * size)
+
+    # The player starts beside a crate it can push back and forth
+    maze[1][1] = PLAYER
+    maze[1][2] = '1'
+    return maze, [9, size * size * 10]
+
+
+def new_model(raw_maze: list[list[str]], player_stats: list[int]
+              ) -> SokobanModel:
+    """ Returns a new model for the given raw maze. """
+    return SokobanModel(template=build_maze_template(raw_maze, player_stats))
+
+
+def bench_convert_maze(raw_maze, player_stats):
+    """ Parsing a raw maze into tiles and entities. """
+    return lambda: convert_maze(raw_maze)
+
+
+def bench_attempt_move(raw_maze, player_stats):
+    """ Stepping back and forth along a row. """
+    model = new_model(raw_maze, player_stats)
+    model.attempt_move(DOWN)
+    directions = [RIGHT, LEFT]
+    state = [0]
+
+    def operation():
+        state[0] ^= 1
+        model.attempt_move(directions[state[0]])
+    return operation
+
+
+def bench_attempt_push(raw_maze, player_stats):
+    """ Pushing a crate back and forth between two cells. """
+    model = new_model(raw_maze, [99, player_stats[1]])
+    maze, entities = model.get_maze(), model.get_entities()
+    for (row, col), entity in entities.items():
+        beside = (row, col + 1)
+        if (entity.get_type() == CRATE and beside not in entities
+                and maze[row][col + 1].get_type() == FLOOR):
+            break
+    else:
+        raise ValueError('no crate can be pushed to the right')
+    pushes = [((row, col), RIGHT), (beside, LEFT)]
+    state = [0]
+
+    def operation():
+        state[0] ^= 1
+        model._attempt_push(*pushes[state[0]])
+    return operation
+
+
+def bench_undo_move(raw_maze, player_stats):
+    """ Undoing moves, from a history of steps back and forth along a row
+        made before each batch is timed.
+    """
+    model = new_model(raw_maze, player_stats)
+    model.attempt_move(DOWN)
+    directions = [RIGHT, LEFT]
+
+    def prepare(count):
+        # Every batch undoes all the moves made for it, so the history never
+        # grows beyond one batch
+        for move in range(count):
+            model.attempt_move(directions[move % 2])
+    return model.undo_move, prepare
+
+
+def bench_has_won(raw_maze, player_stats):
+    """ Checking for a win. """
+    return new_model(raw_maze, player_stats).has_won
+
+
+def bench_reset(raw_maze, player_stats):
+    """ Resetting a model to its initial state. """
+    return new_model(raw_maze, player_stats).reset
+
+
+def bench_sokoban_view(raw_maze, player_stats):
+    """ Drawing the game with the text view, with output discarded. """
+    # The text view lives in a2's support module, which shares its name with
+    # a3's, so load it under a different name.
+    spec = importlib.util.spec_from_file_location(
+        'a2_text_support',
+        os.path.join(os.path.dirname(__file__), '..', 'a2', 'a2_support.py'))
+    support = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(support)
+
+    model = new_model(raw_maze, player_stats)
+    view = support.SokobanView()
+    output = io.StringIO()
+
+    def operation():
+        output.seek(0)
+        output.truncate()
+        with contextlib.redirect_stdout(output):
+            view.display_game(model.get_maze(), model.get_entities(),
+                              model.get_player_position())
+    return operation
+
+
+def bench_fancy_game_view(raw_maze, player_stats):
+    """ Drawing the game on the Tk canvas. """
+    import tkinter as tk
+    from a3 import FancyGameView
+    from a3_support import MAZE_SIZE
+
+    model = new_model(raw_maze, player_stats)
+    root = tk.Tk()
+    root.withdraw()
+    view = FancyGameView(root, model.get_dimensions(), (MAZE_SIZE, MAZE_SIZE))
+
+    def operation():
+        view.display(model.get_maze(), model.get_entities(),
+                     model.get_player_position())
+        root.update_idletasks()
+    return operation
+
+
+def bench_fancy_game_view_move(raw_maze, player_stats):
+    """ Redrawing the Tk canvas after stepping back and forth along a row. """
+    import tkinter as tk
+    from a3 import FancyGameView
+    from a3_support import MAZE_SIZE
+
+    model = new_model(raw_maze, player_stats)
+    model.attempt_move(DOWN)
+    root = tk.Tk()
+    root.withdraw()
+    view = FancyGameView(root, model.get_dimensions(), (MAZE_SIZE, MAZE_SIZE))
+    view.display(model.get_maze(), model.get_entities(),
+                 model.get_player_position(), model.pop_changed_cells())
+    directions = [RIGHT, LEFT]
+    state = [0]
+
+    def operation():
+        state[0] ^= 1
+        model.attempt_move(directions[state[0]])
+        view.display(model.get_maze(), model.get_entities(),
+                     model.get_player_position(), model.pop_changed_cells())
+        root.update_idletasks()
+    return operation
+
+
+BENCHMARKS: dict[str, Benchmark] = {
+    'convert_maze': bench_convert_maze,
+    'SokobanModel.attempt_move': bench_attempt_move,
+    'SokobanModel._attempt_push': bench_attempt_push,
+    'SokobanModel.undo_move': bench_undo_move,
+    'SokobanModel.has_won': bench_has_won,
+    'SokobanModel.reset': bench_reset,
+    'SokobanView.display_game': bench_sokoban_view,
+    'FancyGameView.display': bench_fancy_game_view,
+    'FancyGameView.display (move)': bench_fancy_game_view_move,
+}
+
+
+def measure(
+    operation: Operation,
+    min_time: float,
+    prepare: Prepare | None = None
+) -> dict:
+    """ Times the given operation and measures its allocations.
+
+    Parameters:
+        operation: The operation to measure.
+        min_time: The minimum number of seconds to spend timing.
+        prepare: Called with the number of operations before each batch is
+                    timed or traced, or None if the operation needs no
+                    preparation.
+
+    Returns:
+        A dictionary with the number of operations timed, operations per
+        second and mean peak bytes allocated per operation.
+    """
+    count, batch, elapsed = 0, 1, 0.0
+    while True:
+        if prepare is not None:
+            prepare(batch)
+        start = time.perf_counter()
+        for _ in range(batch):
+            operation()
+        elapsed += time.perf_counter() - start
+        count += batch
+        if elapsed >= min_time:
+            break
+        batch *= 2
+
+    if prepare is not None:
+        prepare(ALLOCATION_SAMPLES)
+    tracemalloc.start()
+    peak_total = 0
+    for _ in range(ALLOCATION_SAMPLES):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        operation()
+        peak_total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        'operations': count,
+        'ops_per_sec': count / elapsed,
+        'alloc_peak_bytes_per_op': peak_total / ALLOCATION_SAMPLES,
+    }
+
+
+def run(sizes: list[int], min_time: float, names: list[str]) -> dict:
+    """ Runs the named benchmarks over the shipped mazes and synthetic mazes
+        of the given sizes.
+
+    Returns:
+        The results, ready to be written as JSON.
+    """
+    mazes = [(maze_file, *read_file(maze_file)) for maze_file in SHIPPED_MAZES]
+    mazes += [(f'synthetic_{size}x{size}', *synthetic_maze(size))
+              for size in sizes]
+
+    results = []
+    for name in names:
+        for maze_name, raw_maze, player_stats in mazes:
+            result = {'benchmark': name, 'maze': maze_name,
+                      'dimensions': [len(raw_maze), len(raw_maze[0])]}
+            try:
+                operation = BENCHMARKS[name](raw_maze, player_stats)
+            except Exception as error:
+                # e.g. no display or no PIL for the Tk benchmark
+                result['skipped'] = f'{type(error).__name__}: {error}'
+            else:
+                prepare = None
+                if isinstance(operation, tuple):
+                    operation, prepare = operation
+                result.update(measure(operation, min_time, prepare))
+            results.append(result)
+            summary = result.get('skipped')
+            if summary is None:
+                summary = f'{result["ops_per_sec"]:.0f} ops/sec'
+            print(f'{name} on {maze_name}: {summary}', file=sys.stderr)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'min_time': min_time,
+        'results': results,
+    }
+
+
+def main() -> None:
+    """ Runs the benchmarks selected on the command line. """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='*',
+                        default=list(DEFAULT_SIZES),
+                        help='sizes of the synthetic square mazes')
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME,
+                        help='minimum seconds to time each benchmark for')
+    parser.add_argument('--benchmarks', nargs='*', default=list(BENCHMARKS),
+                        choices=list(BENCHMARKS), metavar='NAME',
+                        help='benchmarks to run (default: all)')
+    parser.add_argument('--output', help='file to write JSON to '
+                                         '(default: standard output)')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.min_time, args.benchmarks)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+import math
+import random
+import time
+
+from model import SokobanModel, get_template_level
+from solver import SokobanSolver, State
+
+DEFAULT_BUDGET = 0.1
+DEFAULT_MAX_NODES = 200000
+
+# The share of each hint's budget given to the solver to find a shortest win
+# from the current state, before the rest is spent on tree search
+SOLVE_SHARE = 0.5
+
+# The UCT exploration constant. Values are between 0 and 1.
+EXPLORATION = 1 / math.sqrt(2)
+
+# The number of actions played out from a new node before it is scored
+ROLLOUT_DEPTH = 8
+
+# The chance that a rollout takes the action leading to the best scored state,
+# rather than a random action
+GREEDY_CHANCE = 0.75
+
+# The largest score of a state which is not won, reached when the solver's
+# estimate of the moves still needed is 0
+PROGRESS_WEIGHT = 0.5
+
+# The weight of the player's walk to the next useful push in the score. The
+# estimate of the pushes needed drops by one for each push, so the walk
+# counts for less to keep pushing from scoring worse than walking away.
+WALK_WEIGHT = 0.5
+
+
+class Node:
+    """ A node of the search tree. Nodes are recycled by HintAgent, so they
+        are reinitialised with init rather than constructed each time.
+    """
+    __slots__ = ('state', 'parent', 'action', 'children', 'untried',
+                 'visits', 'total', 'best', 'terminal')
+
+    def __init__(self) -> None:
+        """ Constructor for Node. The node must be initialised before use. """
+        self.init(None, None, None, None)
+
+    def init(
+        self,
+        state: State | None,
+        parent: 'Node | None',
+        action: str | None,
+        terminal: float | None
+    ) -> None:
+        """ Initialises the node for a new state.
+
+        Parameters:
+            state: The search state at this node.
+            parent: The node this one was reached from, or None for the root.
+            action: The action taken from the parent to reach this node.
+            terminal: The score of the state if the game is over there, else
+                        None.
+        """
+        self.state = state
+        self.parent = parent
+        self.action = action
+        self.children = []
+        # The (action, state) pairs not yet expanded, or None until the node
+        # is first expanded
+        self.untried = None
+        self.visits = 0
+        self.total = 0.0
+        # The best score of any rollout through this node
+        self.best = 0.0
+        self.terminal = terminal
+
+
+class HintAgent:
+    """ Suggests the next action for a game with Monte Carlo Tree Search.
+
+    Search follows the rules of SokobanSolver, so purchases and picking up
+    potions and coins are part of the actions considered. The tree is kept
+    between hints: when the game has moved on to a state already in the tree,
+    that subtree becomes the new root and the rest of the tree is recycled
+    into a free list of nodes, so no node is allocated twice.
+
+    Each hint first gives the solver part of the budget to find a shortest
+    win from the current state. If it does, the win is kept as a plan, and
+    later hints follow it for as long as the game does.
+    """
+
+    def __init__(
+        self,
+        model: SokobanModel,
+        max_nodes: int = DEFAULT_MAX_NODES,
+        seed: int | None = None
+    ) -> None:
+        """ Constructor for HintAgent.
+
+        Parameters:
+            model: A model playing the level to give hints for. Hints can be
+                    given for any later state of the level.
+            max_nodes: The most nodes the tree may hold. Once it is full, the
+                        search keeps refining the existing nodes.
+            seed: The seed for the random number generator, or None for a
+                    random seed.
+        """
+        self._solver = SokobanSolver(
+            level=get_template_level(model.get_template()))
+        self._max_nodes = max_nodes
+        self._rng = random.Random(seed)
+        self._root = None
+        self._size = 0
+        self._free_nodes = []
+        # The next action of the solver's last win, keyed by the states along
+        # it
+        self._plan = {}
+
+    def get_hint(
+        self,
+        model: SokobanModel,
+        budget: float = DEFAULT_BUDGET
+    ) -> str | None:
+        """ Returns the best next action found within the time budget.
+
+        Parameters:
+            model: The game to give a hint for.
+            budget: The number of seconds to search for.
+
+        Returns:
+            A move (UP, DOWN, LEFT or RIGHT), a shop item id to buy, or None if
+            the game is over or no action can help.
+        """
+        state = self._solver.get_model_state(model)
+        action = self._plan.get(state)
+        if action is not None:
+            return action
+
+        self._set_root(state)
+        if self._root.terminal is not None:
+            return None
+
+        deadline = time.perf_counter() + budget
+        # No line found by tree search can beat a shortest win
+        solution = self._solver.solve(measure_memory=False, start=state,
+                                      time_limit=budget * SOLVE_SHARE).solution
+        if solution:
+            self._set_plan(state, solution)
+            return solution[0]
+
+        while True:
+            self._iterate()
+            if time.perf_counter() >= deadline:
+                break
+
+        # In a single player game with no chance, the best line found matters
+        # more than the average over lines the search tried
+        best = max(self._root.children,
+                   key=lambda child: (child.best, child.visits),
+                   default=None)
+        return None if best is None else best.action
+
+    def get_tree_size(self) -> int:
+        """ Returns the number of nodes in the search tree. """
+        return self._size
+
+    def _iterate(self) -> None:
+        """ Runs one selection, expansion, rollout and backup. """
+        node = self._root
+        while node.terminal is None:
+            if node.untried is None:
+                node.untried = [
+                    (action, child)
+                    for action, _, child in self._solver.get_successors(
+                        node.state)
+                ]
+                self._rng.shuffle(node.untried)
+            if node.untried and self._size < self._max_nodes:
+                action, state = node.untried.pop()
+                child = self._new_node(state, node, action)
+                node.children.append(child)
+                node = child
+                break
+            if not node.children:
+                if not node.untried:
+                    # No action succeeds from here
+                    node.terminal = 0.0
+                break
+            node = self._select(node)
+
+        score = node.terminal
+        if score is None:
+            score = self._rollout(node.state)
+        while node is not None:
+            node.visits += 1
+            node.total += score
+            node.best = max(node.best, score)
+            node = node.parent
+
+    def _select(self, node: Node) -> Node:
+        """ Returns the child of the given node with the best UCT score. """
+        log_visits = math.log(node.visits or 1)
+        return max(
+            node.children,
+            key=lambda child: (
+                math.inf if child.visits == 0 else
+                child.total / child.visits
+                + EXPLORATION * math.sqrt(log_visits / child.visits)
+            ),
+        )
+
+    def _rollout(self, state: State) -> float:
+        """ Returns the score reached by playing actions from the given state
+            for up to ROLLOUT_DEPTH steps. Each action is either the one
+            leading to the best scored state (with GREEDY_CHANCE) or random.
+        """
+        for _ in range(ROLLOUT_DEPTH):
+            score = self._score(state)
+            if score is not None:
+                return score
+            successors = self._solver.get_successors(state)
+            if not successors:
+                return 0.0
+            if self._rng.random() < GREEDY_CHANCE:
+                # Ties are broken at random, so rollouts do not walk back and
+                # forth between equally scored states
+                state = max((child for _, _, child in successors),
+                            key=lambda child: (self._evaluate(child),
+                                               self._rng.random()))
+            else:
+                state = self._rng.choice(successors)[2]
+        return self._evaluate(state)
+
+    def _score(self, state: State) -> float | None:
+        """ Returns the score of the given state if the game is over there (1
+            for a win, 0 for a loss or deadlock), else None.
+        """
+        if self._solver.is_won(state):
+            return 1.0
+        if state[5] <= 0 or self._solver.estimate(state) is None:
+            return 0.0
+        return None
+
+    def _evaluate(self, state: State) -> float:
+        """ Returns the score of a state, which grows as the solver's estimate
+            of the pushes still needed and the player's walk to the next push
+            shrink.
+        """
+        score = self._score(state)
+        if score is not None:
+            return score
+        return PROGRESS_WEIGHT / (1 + self._solver.estimate(state)
+                                  + WALK_WEIGHT
+                                  * self._solver.get_push_walk(state))
+
+    def _set_plan(self, state: State, solution: str) -> None:
+        """ Replaces the plan with the states and actions along the given
+            solution.
+
+        Parameters:
+            state: The state the solution starts from.
+            solution: The actions of a win from that state.
+        """
+        self._plan = {}
+        for action in solution:
+            self._plan[state] = action
+            state = next(child for successor_action, _, child
+                         in self._solver.get_successors(state)
+                         if successor_action == action)
+
+    def _set_root(self, state: State) -> None:
+        """ Makes the node for the given state the root of the tree, keeping
+            its subtree if the state is the root or within two actions of it,
+            and recycling every other node.
+        """
+        old_root = self._root
+        new_root = None
+        if old_root is not None:
+            if old_root.state == state:
+                return
+            for child in old_root.children:
+                if child.state == state:
+                    new_root = child
+                    break
+                for grandchild in child.children:
+                    if grandchild.state == state:
+                        new_root = grandchild
+                        break
+                if new_root is not None:
+                    break
+
+        if new_root is None:
+            new_root = self._new_node(state, None, None)
+        else:
+            new_root.parent = None
+        if old_root is not None:
+            self._recycle(old_root, new_root)
+        self._root = new_root
+
+    def _new_node(self, state: State, parent: Node | None,
+                  action: str | None) -> Node:
+        """ Returns a node for the given state, reusing a recycled node if
+            there is one.
+        """
+        node = self._free_nodes.pop() if self._free_nodes else Node()
+        node.init(state, parent, action, self._score(state))
+        self._size += 1
+        return node
+
+    def _recycle(self, root: Node, keep: Node) -> None:
+        """ Returns every node under the given root to the free list, except
+            the subtree of keep.
+        """
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            if node is keep:
+                continue
+            pending.extend(node.children)
+            node.init(None, None, None, None)
+            self._free_nodes.append(node)
+            self._size -= 1
@@ -0,0 +1,260 @@
+""" Generates random Sokoban levels which are verified to be solvable.
+
+Run from the a3 directory, e.g.
+    python level_generator.py generated --count 100 --workers 8
+"""
+import argparse
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, NamedTuple
+
+from a2_support import *
+from model import COIN, GOAL_CODE, TILE_IDS_TO_CODE, find_dead_squares
+from solver import SokobanSolver
+
+ITEMS = (STRENGTH_POTION, MOVE_POTION, FANCY_POTION, COIN)
+START_STRENGTH = 1
+
+# The number of seeds sent to the pool at a time, per worker
+SEEDS_PER_WORKER = 8
+
+# The most seeds tried by default before giving up, per level asked for
+SEEDS_PER_LEVEL = 1000
+
+
+class GeneratorOptions(NamedTuple):
+    """ The shape of the levels to generate. """
+    rows: int = 7
+    cols: int = 8
+    crates: int = 2
+    # The chance of each inside cell being a wall
+    wall_density: float = 0.12
+    # The number of potions and coins to scatter
+    items: int = 2
+    # Crate strengths are between 1 and this
+    max_strength: int = 3
+    # The moves given beyond the fewest needed to win
+    slack: int = 2
+    # Levels which can be won in fewer moves are rejected as too easy
+    min_moves: int = 8
+    # The most states the solver may expand before a level is rejected
+    max_nodes: int = 20000
+
+
+class GeneratedLevel(NamedTuple):
+    """ A generated level and the shortest solution found for it. """
+    seed: int
+    raw_maze: list[list[str]]
+    player_stats: list[int]
+    solution: str
+
+
+def generate_level(
+    seed: int,
+    options: GeneratorOptions = GeneratorOptions()
+) -> GeneratedLevel | None:
+    """ Generates a level from the given seed, and checks that it can be won.
+
+        The move budget is set to the moves used by the shortest solution plus
+        the slack, and the level is solved again with that budget to confirm.
+
+    Parameters:
+        seed: The seed for the level. The same seed and options always give
+                the same level.
+        options: The shape of the level.
+
+    Returns:
+        The level, or None if the seed gave a level which could not be won,
+        was too easy, or took too long to solve.
+    """
+    rng = random.Random(seed)
+    rows, cols = options.rows, options.cols
+    raw_maze = [[WALL] * cols for _ in range(rows)]
+    for row in range(1, rows - 1):
+        for col in range(1, cols - 1):
+            if rng.random() >= options.wall_density:
+                raw_maze[row][col] = FLOOR
+
+    region = _largest_region(raw_maze)
+    needed = 2 * options.crates + options.items + 1
+    if len(region) < needed * 2:
+        return None
+    for row in range(rows):
+        for col in range(cols):
+            if (row, col) not in region:
+                raw_maze[row][col] = WALL
+
+    cells = sorted(region)
+    rng.shuffle(cells)
+    goals, cells = cells[:options.crates], cells[options.crates:]
+    for row, col in goals:
+        raw_maze[row][col] = GOAL
+
+    # Crates may not start where they could never be pushed onto a goal
+    tiles = bytearray(TILE_IDS_TO_CODE[tile] for raw_row in raw_maze
+                      for tile in raw_row)
+    dead = find_dead_squares(
+        tiles, cols,
+        [index for index, code in enumerate(tiles) if code == GOAL_CODE])
+    live = [(row, col) for row, col in cells if not dead[row * cols + col]]
+    if len(live) < options.crates:
+        return None
+    crates = live[:options.crates]
+    for row, col in crates:
+        raw_maze[row][col] = str(rng.randint(1, options.max_strength))
+
+    cells = [cell for cell in cells if cell not in crates]
+    player, items = cells[0], cells[1:options.items + 1]
+    raw_maze[player[0]][player[1]] = PLAYER
+    for row, col in items:
+        raw_maze[row][col] = rng.choice(ITEMS)
+
+    # Solve with moves to spare, then again with the tightened budget
+    generous = [START_STRENGTH, rows * cols * options.crates]
+    result = SokobanSolver(level=(raw_maze, generous)).solve(
+        options.max_nodes, measure_memory=False)
+    if result.solution is None:
+        return None
+    moves = sum(action in DIRECTION_DELTAS for action in result.solution)
+    if moves < options.min_moves:
+        return None
+
+    player_stats = [START_STRENGTH, moves + options.slack]
+    result = SokobanSolver(level=(raw_maze, player_stats)).solve(
+        options.max_nodes, measure_memory=False)
+    if result.solution is None:
+        return None
+    return GeneratedLevel(seed, raw_maze, player_stats, result.solution)
+
+
+def generate_levels(
+    count: int,
+    options: GeneratorOptions = GeneratorOptions(),
+    seed: int = 0,
+    workers: int | None = None,
+    max_seeds: int | None = None
+) -> Iterator[GeneratedLevel]:
+    """ Generates solvable levels across a pool of processes. Seeds are tried
+        in order from the given seed, and levels are yielded in seed order,
+        so the output only depends on the arguments, not on timing.
+
+        Raises ValueError once max_seeds seeds have been tried without
+        finding count levels, e.g. because the options allow too few moves
+        or too little room for the crates.
+
+    Parameters:
+        count: The number of levels to generate.
+        options: The shape of the levels.
+        seed: The first seed to try.
+        workers: The number of worker processes, or None for one per CPU.
+        max_seeds: The most seeds to try, or None for SEEDS_PER_LEVEL per
+                    level.
+
+    Yields:
+        Each level, as soon as it and every level before it is ready.
+    """
+    workers = workers or os.cpu_count() or 1
+    if max_seeds is None:
+        max_seeds = count * SEEDS_PER_LEVEL
+    end = seed + max_seeds
+    found = 0
+    with ProcessPoolExecutor(workers) as executor:
+        while found < count:
+            if seed >= end:
+                raise ValueError(f'found {found} of {count} levels in '
+                                 f'{max_seeds} seeds')
+            seeds = range(seed, min(seed + workers * SEEDS_PER_WORKER, end))
+            seed = seeds.stop
+            for level in executor.map(generate_level, seeds,
+                                      [options] * len(seeds),
+                                      chunksize=SEEDS_PER_WORKER):
+                if level is not None:
+                    yield level
+                    found += 1
+                    if found == count:
+                        break
+
+
+def write_maze_file(
+    maze_file: str,
+    raw_maze: list[list[str]],
+    player_stats: list[int]
+) -> None:
+    """ Writes a level in the maze file format read by read_file.
+
+    Parameters:
+        maze_file: The path to write to.
+        raw_maze: The raw maze.
+        player_stats: The player's starting strength and moves remaining.
+    """
+    with open(maze_file, 'w') as file:
+        file.write(' '.join(str(stat) for stat in player_stats) + '\n')
+        for row in raw_maze:
+            file.write(''.join(row) + '\n')
+
+
+def _largest_region(raw_maze: list[list[str]]) -> set[Position]:
+    """ Returns the positions of the largest group of connected non-wall
+        cells in the given raw maze.
+    """
+    largest = set()
+    seen = set()
+    for row, raw_row in enumerate(raw_maze):
+        for col, tile in enumerate(raw_row):
+            if tile == WALL or (row, col) in seen:
+                continue
+            region = {(row, col)}
+            pending = [(row, col)]
+            while pending:
+                cell_row, cell_col = pending.pop()
+                for d_row, d_col in DIRECTION_DELTAS.values():
+                    cell = (cell_row + d_row, cell_col + d_col)
+                    if (cell not in region
+                            and raw_maze[cell[0]][cell[1]] != WALL):
+                        region.add(cell)
+                        pending.append(cell)
+            seen |= region
+            if len(region) > len(largest):
+                largest = region
+    return largest
+
+
+def main() -> None:
+    """ Generates levels into the directory given on the command line. """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output_dir', help='directory to write maze files to')
+    parser.add_argument('--count', type=int, default=10,
+                        help='the number of levels to generate')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the first seed to try')
+    parser.add_argument('--workers', type=int,
+                        help='number of worker processes (default: one per '
+                             'CPU)')
+    parser.add_argument('--max-seeds', type=int,
+                        help='the most seeds to try before giving up '
+                             f'(default: {SEEDS_PER_LEVEL} per level)')
+    defaults = GeneratorOptions()
+    for name, default in defaults._asdict().items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(default),
+                            default=default)
+    args = parser.parse_args()
+    options = GeneratorOptions(**{name: getattr(args, name)
+                                  for name in defaults._fields})
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    levels = generate_levels(args.count, options, args.seed, args.workers,
+                             args.max_seeds)
+    try:
+        for number, level in enumerate(levels, start=1):
+            maze_file = os.path.join(args.output_dir,
+                                     f'level_{number:04}.txt')
+            write_maze_file(maze_file, level.raw_maze, level.player_stats)
+            print(f'{maze_file}: seed {level.seed}, '
+                  f'solution {level.solution}')
+    except ValueError as error:
+        parser.exit(1, f'{parser.prog}: {error}\n')
+
+
+if __name__ == '__main__':
+    main()
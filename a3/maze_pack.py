@@ -0,0 +1,207 @@
+import mmap
+import struct
+import sys
+from typing import Iterable, Iterator
+
+from a2_support import *
+from model import MazeTemplate, SokobanModel, build_maze_template
+
+# A pack starts with a fixed size header, followed by the levels, followed by
+# an index holding the file offset of each level.
+#
+#   header: magic, version, level count, index offset
+#   level:  rows, columns, strength, moves, then rows * columns maze bytes
+#   index:  one unsigned 64-bit offset per level
+PACK_MAGIC = b'SOKP'
+PACK_VERSION = 1
+HEADER = struct.Struct('<4sHxxIQ')
+LEVEL_HEADER = struct.Struct('<HHii')
+INDEX_ENTRY = struct.Struct('<Q')
+
+Level = tuple[list[list[str]], list[int]]
+
+
+class PackError(ValueError):
+    """ Raised when a file is not a valid maze pack. """
+
+
+def iter_levels(text_pack_file: str) -> Iterator[Level]:
+    """ A generator which reads a multi-level maze text file one level at a
+        time. Levels are separated by blank lines, and each is in the same
+        format as a single maze file: a line with the player's starting
+        strength and moves remaining, followed by the rows of the maze.
+
+    Parameters:
+        text_pack_file: The path to the multi-level maze text file.
+
+    Yields:
+        For each level in turn, a tuple in the same format as read_file.
+    """
+    with open(text_pack_file, 'r') as file:
+        maze, player_stats = [], None
+        for line in file:
+            line = line.strip()
+            if not line:
+                if player_stats is not None:
+                    yield maze, player_stats
+                maze, player_stats = [], None
+            elif player_stats is None:
+                player_stats = [int(item) for item in line.split(' ')]
+            else:
+                maze.append(list(line))
+
+        if player_stats is not None:
+            yield maze, player_stats
+
+
+def write_pack(levels: Iterable[Level], pack_file: str) -> int:
+    """ Writes levels to a binary maze pack. Levels are written as they are
+        produced, so only the offset index is held in memory.
+
+    Parameters:
+        levels: The (raw maze, player stats) of each level, as returned by
+                read_file.
+        pack_file: The path of the pack to write.
+
+    Returns:
+        The number of levels written.
+    """
+    offsets = []
+    with open(pack_file, 'wb') as file:
+        file.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, 0))
+        for raw_maze, (strength, moves) in levels:
+            rows, cols = len(raw_maze), len(raw_maze[0])
+            offsets.append(file.tell())
+            file.write(LEVEL_HEADER.pack(rows, cols, strength, moves))
+            for row in raw_maze:
+                file.write(''.join(row).ljust(cols)[:cols].encode('ascii'))
+
+        index_offset = file.tell()
+        for offset in offsets:
+            file.write(INDEX_ENTRY.pack(offset))
+        file.seek(0)
+        file.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, len(offsets),
+                               index_offset))
+    return len(offsets)
+
+
+def compile_pack(maze_files: Iterable[str], pack_file: str) -> int:
+    """ Compiles maze text files into a single binary maze pack.
+
+    Parameters:
+        maze_files: The paths of the maze files, in level order.
+        pack_file: The path of the pack to write.
+
+    Returns:
+        The number of levels written.
+    """
+    return write_pack((read_file(maze_file) for maze_file in maze_files),
+                      pack_file)
+
+
+def compile_text_pack(text_pack_file: str, pack_file: str) -> int:
+    """ Compiles a multi-level maze text file, as read by iter_levels, into a
+        binary maze pack. Levels are streamed, so the text file is never held
+        in memory.
+
+    Parameters:
+        text_pack_file: The path of the multi-level maze text file.
+        pack_file: The path of the pack to write.
+
+    Returns:
+        The number of levels written.
+    """
+    return write_pack(iter_levels(text_pack_file), pack_file)
+
+
+class MazePack:
+    """ A read-only binary maze pack, memory-mapped so that opening it and
+        loading any one level are independent of the size of the pack.
+    """
+
+    def __init__(self, pack_file: str) -> None:
+        """ Constructor for MazePack.
+
+        Parameters:
+            pack_file: The path of the pack, as written by write_pack.
+        """
+        with open(pack_file, 'rb') as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._data) < HEADER.size:
+            raise PackError(f'{pack_file} is too short to be a maze pack')
+        magic, version, self._count, self._index_offset = \
+            HEADER.unpack_from(self._data)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise PackError(f'{pack_file} is not a version {PACK_VERSION} '
+                            f'maze pack')
+
+    def __len__(self) -> int:
+        """ Returns the number of levels in the pack. """
+        return self._count
+
+    def __iter__(self) -> Iterator[Level]:
+        """ Yields the (raw maze, player stats) of each level in order. """
+        for level in range(self._count):
+            yield self.get_level(level)
+
+    def get_level(self, level: int) -> Level:
+        """ Returns the (raw maze, player stats) of the given level, in the
+            same format as read_file.
+
+        Parameters:
+            level: The index of the level in the pack.
+        """
+        if not 0 <= level < self._count:
+            raise IndexError(f'level {level} is not in the pack')
+        offset, = INDEX_ENTRY.unpack_from(
+            self._data, self._index_offset + level * INDEX_ENTRY.size)
+        rows, cols, strength, moves = LEVEL_HEADER.unpack_from(self._data,
+                                                               offset)
+        start = offset + LEVEL_HEADER.size
+        raw_maze = [
+            list(self._data[row:row + cols].decode('ascii'))
+            for row in range(start, start + rows * cols, cols)
+        ]
+        return raw_maze, [strength, moves]
+
+    def get_template(self, level: int) -> MazeTemplate:
+        """ Returns the parsed template of the given level.
+
+        Parameters:
+            level: The index of the level in the pack.
+        """
+        return build_maze_template(*self.get_level(level))
+
+    def create_model(self, level: int) -> SokobanModel:
+        """ Returns a new model for the given level.
+
+        Parameters:
+            level: The index of the level in the pack.
+        """
+        return SokobanModel(template=self.get_template(level))
+
+    def close(self) -> None:
+        """ Unmaps the pack. No levels can be loaded afterwards. """
+        self._data.close()
+
+    def __enter__(self) -> 'MazePack':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main() -> None:
+    """ Compiles the maze files given on the command line into a pack, e.g.
+        python maze_pack.py levels.pack maze_files/*.txt
+    """
+    if len(sys.argv) < 3:
+        print('Usage: python maze_pack.py PACK_FILE MAZE_FILE...')
+        return
+    count = compile_pack(sys.argv[2:], sys.argv[1])
+    print(f'Wrote {count} levels to {sys.argv[1]}')
+
+
+if __name__ == '__main__':
+    main()
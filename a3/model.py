@@ -1,11 +1,38 @@
+import os
+import time
+from array import array
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Callable, NamedTuple
 from a2_support import *
 
 COIN = '$'
 COIN_AMOUNT = 5
 
+UNDO = 'u'
+REDO = 'r'
+
+# Zobrist hashing constants. Board features are identified by the character of
+# the tile or entity type, and the player's stats by the ids below.
+HASH_MASK = (1 << 64) - 1
+STRENGTH_FEATURE = 1
+MOVES_FEATURE = 2
+MONEY_FEATURE = 3
+
+# The maximum number of parsed mazes kept by load_maze_template
+MAZE_CACHE_SIZE = 256
+
+# The order of directions in the neighbour tables, chosen so that d ^ 1 is the
+# direction opposite DIRECTIONS[d]
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+DIRECTION_INDICES = {direction: d for d, direction in enumerate(DIRECTIONS)}
+# Marks a neighbour which is a wall or out of bounds
+NO_CELL = -1
+
 
 class Tile:
     """ Abstract class for a tile in the maze. """
+    __slots__ = ()
     TYPE = 'Abstract Tile'
     BLOCKING = False
 
@@ -26,17 +53,20 @@ class Tile:
 
 class Floor(Tile):
     """ A basic floor tile (non-blocking) in the maze. """
+    __slots__ = ()
     TYPE = FLOOR
 
 
 class Wall(Tile):
     """ A basic wall tile (blocking) in the maze. """
+    __slots__ = ()
     TYPE = WALL
     BLOCKING = True
 
 
 class Goal(Tile):
     """ A goal tile onto which crates should be pushed in the maze. """
+    __slots__ = ('_is_filled',)
     TYPE = GOAL
 
     def __init__(self) -> None:
@@ -62,6 +92,7 @@ class Goal(Tile):
 
 class Entity:
     """ Abstract class for an entity in the maze. """
+    __slots__ = ()
     TYPE = 'Abstract Entity'
     MOVABLE = False
 
@@ -82,6 +113,7 @@ class Entity:
 
 class Crate(Entity):
     """ A crate entity in the maze. """
+    __slots__ = ('_strength',)
     TYPE = CRATE
     MOVABLE = True
 
@@ -106,11 +138,13 @@ class Coin(Entity):
     """ A coin entity in the maze, which can be collected by a player to
         increase their money.
     """
+    __slots__ = ()
     TYPE = COIN
 
 
 class Potion(Entity):
     """ Abstract class for a potion entity in the maze. """
+    __slots__ = ()
     TYPE = 'Potion'
     EFFECT = {}
 
@@ -123,12 +157,14 @@ class Potion(Entity):
 
 class StrengthPotion(Potion):
     """ A potion that increases the strength of the player. """
+    __slots__ = ()
     TYPE = STRENGTH_POTION
     EFFECT = {'strength': 2}
 
 
 class MovePotion(Potion):
     """ A potion that increases the moves remaining for the player. """
+    __slots__ = ()
     TYPE = MOVE_POTION
     EFFECT = {'moves': 5}
 
@@ -137,12 +173,14 @@ class FancyPotion(Potion):
     """ A potion that increases both the strength and moves remaining for the
         player.
     """
+    __slots__ = ()
     TYPE = FANCY_POTION
     EFFECT = {'strength': 2, 'moves': 2}
 
 
 class Player(Entity):
     """ A player entity in the maze. """
+    __slots__ = ('_strength', '_moves_remaining', '_money')
     TYPE = PLAYER
 
     def __init__(self, start_strength: int, moves_remaining: int) -> None:
@@ -224,6 +262,99 @@ ENTITY_IDS_TO_CLASS = {
     FANCY_POTION: FancyPotion,
 }
 
+# Compact tile codes used by the flat board representation in SokobanModel
+FLOOR_CODE = 0
+WALL_CODE = 1
+GOAL_CODE = 2
+
+TILE_IDS_TO_CODE = {
+    FLOOR: FLOOR_CODE,
+    WALL: WALL_CODE,
+    GOAL: GOAL_CODE,
+    FILLED_GOAL: GOAL_CODE,
+}
+
+CODE_TO_TILE_ID = (FLOOR, WALL, GOAL)
+
+# Floors, walls, coins and potions have no state of their own, so one instance
+# of each is shared by every cell that holds one. Goals can be filled and crates
+# are moved, so those are still made per cell.
+SHARED_TILES = {
+    FLOOR: Floor(),
+    WALL: Wall(),
+}
+
+SHARED_ENTITIES = {
+    COIN: Coin(),
+    STRENGTH_POTION: StrengthPotion(),
+    MOVE_POTION: MovePotion(),
+    FANCY_POTION: FancyPotion(),
+}
+
+
+def make_tile(tile_type: str) -> Tile:
+    """ Returns the tile for a character of a raw maze. Characters of entities
+        give the floor beneath them.
+
+    Parameters:
+        tile_type: The character from the raw maze.
+    """
+    if tile_type == GOAL:
+        return Goal()
+    if tile_type == FILLED_GOAL:
+        goal = Goal()
+        goal.fill()
+        return goal
+    return SHARED_TILES.get(tile_type, SHARED_TILES[FLOOR])
+
+
+def make_entity(entity_type: str) -> Entity:
+    """ Returns the entity for a character of a raw maze or an item id from
+        the shop. The player is not made here, as it is not kept with the
+        other entities.
+
+    Parameters:
+        entity_type: A crate strength digit, or the id of a coin or potion.
+    """
+    if entity_type.isdigit():
+        return Crate(int(entity_type))
+    return SHARED_ENTITIES[entity_type]
+
+
+@lru_cache(maxsize=1 << 16)
+def zobrist_key(feature: int, index: int, value: int = 0) -> int:
+    """ Returns the pseudo-random 64-bit Zobrist key for one feature of a game
+        state. The same arguments always produce the same key, in every process.
+
+    Parameters:
+        feature: The kind of feature (e.g. ord(CRATE) or STRENGTH_FEATURE).
+        index: The board index of the feature, or 0 for the player's stats.
+        value: An extra value distinguishing the feature (e.g. crate strength).
+
+    Returns:
+        The 64-bit key for the feature.
+    """
+    key = 0
+    for part in (feature, index, value):
+        # splitmix64 finaliser
+        key = (key ^ part) + 0x9E3779B97F4A7C15 & HASH_MASK
+        key = (key ^ (key >> 30)) * 0xBF58476D1CE4E5B9 & HASH_MASK
+        key = (key ^ (key >> 27)) * 0x94D049BB133111EB & HASH_MASK
+        key ^= key >> 31
+    return key
+
+
+def entity_key(index: int, entity: 'Entity') -> int:
+    """ Returns the Zobrist key for an entity at the given board index.
+
+    Parameters:
+        index: The row-major board index of the entity.
+        entity: The entity.
+    """
+    if entity.get_type() == CRATE:
+        return zobrist_key(ord(CRATE), index, entity.get_strength())
+    return zobrist_key(ord(entity.get_type()), index)
+
 
 def convert_maze(raw_maze: list[list[str]]) -> tuple[Grid, Entities, Position]:
     """ Converts a raw maze into a proper maze, entities and player position.
@@ -246,26 +377,335 @@ def convert_maze(raw_maze: list[list[str]]) -> tuple[Grid, Entities, Position]:
     for i, row in enumerate(raw_maze):
         new_row = []
         for j, tile_type in enumerate(row):
-            tile = TILE_IDS_TO_CLASS.get(tile_type, Floor)()
-            if tile_type == FILLED_GOAL:
-                tile.fill()
-
-            new_row.append(tile)
+            new_row.append(make_tile(tile_type))
             if not TILE_IDS_TO_CLASS.get(tile_type):
                 if tile_type == PLAYER:
                     player_position = (i, j)
                 else:
-                    if tile_type.isdigit():
-                        tile_type = int(tile_type)
-                        entity = Crate(tile_type)
-                    else:
-                        entity = ENTITY_IDS_TO_CLASS.get(tile_type)()
-
-                    entities[(i, j)] = entity
+                    entities[(i, j)] = make_entity(tile_type)
         proper_maze.append(new_row)
     return proper_maze, entities, player_position
 
 
+def compact_maze(
+    raw_maze: list[list[str]]
+) -> tuple[bytearray, bytearray, Entities, Position]:
+    """ Converts a raw maze into a flat board, entities and player position.
+
+    Parameters:
+        raw_maze: The raw maze from the file.
+
+    Returns:
+        A tuple containing four items:
+            1) The tile codes of the maze as a row-major bytearray, with one
+                byte per cell (see FLOOR_CODE, WALL_CODE and GOAL_CODE).
+            2) A bitset (as a bytearray) with one bit per cell, set iff the
+                cell holds a filled goal.
+            3) A dictionary mapping (row, col) positions to the entities at
+                those positions on the maze, as for convert_maze.
+            4) The player's starting position.
+    """
+    cols = len(raw_maze[0])
+    tiles = bytearray(len(raw_maze) * cols)
+    filled = bytearray((len(tiles) + 7) // 8)
+    entities = {}
+    player_position = None
+
+    for i, row in enumerate(raw_maze):
+        for j, tile_type in enumerate(row[:cols]):
+            index = i * cols + j
+            code = TILE_IDS_TO_CODE.get(tile_type)
+            if code is not None:
+                tiles[index] = code
+                if tile_type == FILLED_GOAL:
+                    filled[index >> 3] |= 1 << (index & 7)
+            elif tile_type == PLAYER:
+                player_position = (i, j)
+            else:
+                entities[(i, j)] = make_entity(tile_type)
+    return tiles, filled, entities, player_position
+
+
+def find_dead_squares(
+    tiles: bytearray,
+    cols: int,
+    goals: list[int]
+) -> bytearray:
+    """ Finds the dead squares of a flat board: the non-wall cells from which
+        a crate can never be pushed onto any of the given goals, whatever the
+        positions of the player and the other entities.
+
+    Parameters:
+        tiles: The tile codes of the maze, as returned by compact_maze.
+        cols: The number of columns in the maze.
+        goals: The board indices of the goals crates should be pushed onto.
+
+    Returns:
+        A bytearray with one byte per cell, which is 1 iff the cell is dead.
+    """
+    rows = len(tiles) // cols
+    live = bytearray(len(tiles))
+    for goal in goals:
+        live[goal] = 1
+
+    # Pull crates backwards from the goals. A crate can be pulled from a cell
+    # to a neighbour if the cell beyond that neighbour is free for the player.
+    queue = deque(goals)
+    while queue:
+        row, col = divmod(queue.popleft(), cols)
+        for d_row, d_col in DIRECTION_DELTAS.values():
+            crate_row, crate_col = row + d_row, col + d_col
+            player_row, player_col = row + 2 * d_row, col + 2 * d_col
+            if not (0 <= player_row < rows and 0 <= player_col < cols):
+                continue
+            crate_index = crate_row * cols + crate_col
+            if (live[crate_index] or tiles[crate_index] == WALL_CODE
+                    or tiles[player_row * cols + player_col] == WALL_CODE):
+                continue
+            live[crate_index] = 1
+            queue.append(crate_index)
+
+    return bytearray(
+        code != WALL_CODE and not live[index]
+        for index, code in enumerate(tiles)
+    )
+
+
+def build_neighbour_tables(
+    tiles: bytes,
+    cols: int
+) -> tuple[tuple[array, ...], tuple[array, ...]]:
+    """ Builds the tables used to look up moves and pushes on a flat board.
+
+    Parameters:
+        tiles: The tile codes of the maze, as returned by compact_maze.
+        cols: The number of columns in the maze.
+
+    Returns:
+        A tuple containing two items, each with one array per direction in
+        DIRECTIONS:
+            1) neighbours[d][index] is the index reached by moving from index
+                in DIRECTIONS[d].
+            2) push_targets[d][index] is the index a crate lands on when the
+                player at index pushes it in DIRECTIONS[d].
+        Entries are NO_CELL where that cell is a wall or out of bounds, and
+        for every wall cell.
+    """
+    size = len(tiles)
+    rows = size // cols
+    neighbours = []
+    for direction in DIRECTIONS:
+        d_row, d_col = DIRECTION_DELTAS[direction]
+        offset = d_row * cols + d_col
+        table = array('i', [NO_CELL]) * size
+        for index, code in enumerate(tiles):
+            if code == WALL_CODE:
+                continue
+            row, col = divmod(index, cols)
+            if (0 <= row + d_row < rows and 0 <= col + d_col < cols
+                    and tiles[index + offset] != WALL_CODE):
+                table[index] = index + offset
+        neighbours.append(table)
+
+    push_targets = []
+    for table in neighbours:
+        push_table = array('i', [NO_CELL]) * size
+        for index, neighbour in enumerate(table):
+            if neighbour != NO_CELL:
+                push_table[index] = table[neighbour]
+        push_targets.append(push_table)
+    return tuple(neighbours), tuple(push_targets)
+
+
+class MazeTemplate(NamedTuple):
+    """ An immutable, fully parsed maze from which SokobanModel instances are
+        reset. Entities are shared between models, since they are never
+        modified.
+    """
+    dimensions: tuple[int, int]
+    tiles: bytes
+    filled: bytes
+    entities: tuple[tuple[Position, 'Entity'], ...]
+    # The same entities grouped by type, as (type, entities) pairs with a
+    # pair for every type of entity other than the player
+    entities_by_type: tuple[tuple[str, tuple[tuple[Position, 'Entity'], ...]],
+                            ...]
+    player_position: Position
+    player_stats: tuple[int, int]
+    # The positions of every goal, filled or not
+    goal_positions: tuple[Position, ...]
+    dead_squares: bytes
+    # The move and push tables from build_neighbour_tables
+    neighbours: tuple[array, ...]
+    push_targets: tuple[array, ...]
+    # The Zobrist hash of the player's position, the entities and the filled
+    # goals (excluding the player's stats)
+    board_hash: int
+
+
+def check_level(raw_maze: list[list[str]], player_stats: list[int]) -> None:
+    """ Raises ValueError if the given raw maze and player stats, as returned
+        by read_file, are not a level which can be played: the stats must be
+        a strength and a number of moves, and the maze must hold exactly one
+        player and no unknown characters.
+
+    Parameters:
+        raw_maze: The raw maze.
+        player_stats: The player's starting strength and moves remaining.
+    """
+    if len(player_stats) != 2:
+        raise ValueError(f'expected a strength and moves, not {player_stats}')
+    if not raw_maze or not raw_maze[0]:
+        raise ValueError('the maze is empty')
+    players = 0
+    for row in raw_maze:
+        for tile_type in row:
+            if tile_type == PLAYER:
+                players += 1
+            elif not (tile_type in TILE_IDS_TO_CLASS or tile_type.isdigit()
+                      or (tile_type in ENTITY_IDS_TO_CLASS
+                          and tile_type != CRATE)):
+                raise ValueError(f'unknown maze character {tile_type!r}')
+    if players != 1:
+        raise ValueError(f'expected one player, not {players}')
+
+
+def build_maze_template(
+    raw_maze: list[list[str]],
+    player_stats: list[int]
+) -> MazeTemplate:
+    """ Builds a template from a raw maze and player stats, as returned by
+        read_file. Raises ValueError if the level cannot be played (see
+        check_level).
+
+    Parameters:
+        raw_maze: The raw maze.
+        player_stats: The player's starting strength and moves remaining.
+
+    Returns:
+        The parsed maze template.
+    """
+    check_level(raw_maze, player_stats)
+    tiles, filled, entities, player_position = compact_maze(raw_maze)
+    cols = len(raw_maze[0])
+
+    goals = []
+    goal_positions = []
+    board_hash = zobrist_key(ord(PLAYER),
+                             player_position[0] * cols + player_position[1])
+    for index, code in enumerate(tiles):
+        if code == GOAL_CODE:
+            goal_positions.append(divmod(index, cols))
+            if filled[index >> 3] & (1 << (index & 7)):
+                board_hash ^= zobrist_key(ord(FILLED_GOAL), index)
+            else:
+                goals.append(index)
+    entities_by_type = {entity_type: [] for entity_type in ENTITY_IDS_TO_CLASS
+                        if entity_type != PLAYER}
+    for (row, col), entity in entities.items():
+        board_hash ^= entity_key(row * cols + col, entity)
+        entities_by_type[entity.get_type()].append(((row, col), entity))
+
+    return MazeTemplate(
+        (len(raw_maze), cols),
+        bytes(tiles),
+        bytes(filled),
+        tuple(entities.items()),
+        tuple((entity_type, tuple(group))
+              for entity_type, group in entities_by_type.items()),
+        player_position,
+        tuple(player_stats),
+        tuple(goal_positions),
+        bytes(find_dead_squares(tiles, cols, goals)),
+        *build_neighbour_tables(tiles, cols),
+        board_hash,
+    )
+
+
+def get_template_level(
+    template: MazeTemplate
+) -> tuple[list[list[str]], list[int]]:
+    """ Returns the raw maze and player stats a template was built from, in
+        the format returned by read_file.
+
+    Parameters:
+        template: The template to convert back.
+    """
+    rows, cols = template.dimensions
+    raw_maze = []
+    for row in range(rows):
+        raw_row = []
+        for index in range(row * cols, (row + 1) * cols):
+            if template.filled[index >> 3] & (1 << (index & 7)):
+                raw_row.append(FILLED_GOAL)
+            else:
+                raw_row.append(CODE_TO_TILE_ID[template.tiles[index]])
+        raw_maze.append(raw_row)
+    for (row, col), entity in template.entities:
+        raw_maze[row][col] = str(entity)
+    row, col = template.player_position
+    raw_maze[row][col] = PLAYER
+    return raw_maze, list(template.player_stats)
+
+
+_maze_cache = OrderedDict()
+
+
+def load_maze_template(maze_file: str) -> MazeTemplate:
+    """ Returns the template for the given maze file. Templates are cached
+        for the whole process, keyed by path and modification time, so a file
+        is only read and parsed again after it changes. The least recently used
+        templates are evicted beyond MAZE_CACHE_SIZE.
+
+    Parameters:
+        maze_file: The path to the maze file (e.g. 'maze_files/maze1.txt')
+    """
+    key = os.path.abspath(maze_file)
+    modified = os.stat(key).st_mtime_ns
+    cached = _maze_cache.get(key)
+    if cached is not None and cached[0] == modified:
+        _maze_cache.move_to_end(key)
+        return cached[1]
+
+    template = build_maze_template(*read_file(maze_file))
+    _maze_cache[key] = (modified, template)
+    _maze_cache.move_to_end(key)
+    while len(_maze_cache) > MAZE_CACHE_SIZE:
+        _maze_cache.popitem(last=False)
+    return template
+
+
+def clear_maze_cache() -> None:
+    """ Removes every template cached by load_maze_template. """
+    _maze_cache.clear()
+
+
+class Delta(NamedTuple):
+    """ The changes made to the game state by one successful move or purchase.
+        Deltas are recorded in the model's history so that the action can be
+        undone and redone without copying the maze or entities.
+    """
+    # The player's position before and after the action
+    old_position: Position
+    new_position: Position
+
+    # The crate pushed by the action (or None), and where it was pushed from
+    # and to. If the crate filled a goal, filled is the goal's board index and
+    # the crate no longer exists as an entity.
+    crate: 'Crate | None'
+    crate_from: 'Position | None'
+    crate_to: 'Position | None'
+    filled: 'int | None'
+
+    # The coin or potion picked up by the action (or None)
+    consumed: 'Entity | None'
+
+    # The changes to the player's strength, moves remaining and money
+    strength: int
+    moves: int
+    money: int
+
+
 class SokobanModel:
     """ A model for a Sokoban game. """
     ITEM_COSTS = {
@@ -274,29 +714,137 @@ class SokobanModel:
         FANCY_POTION: 10,
     }
 
-    def __init__(self, maze_file: str) -> None:
-        """ Constructor for SokobanModel.
+    # Maps the name of each profiled operation to the method measured for it
+    PROFILED_METHODS = {
+        'moves': 'attempt_move',
+        'pushes': '_attempt_push',
+        'potions': '_handle_potion',
+        'purchases': 'attempt_purchase',
+        'undos': 'undo_move',
+        'win_checks': 'has_won',
+    }
+
+    def __init__(
+        self,
+        maze_file: str | None = None,
+        template: MazeTemplate | None = None,
+        profile: bool = False
+    ) -> None:
+        """ Constructor for SokobanModel. Exactly one of maze_file and template
+            should be given.
 
         Parameters:
             maze_file: The path to the maze file (e.g. 'maze_files/maze1.txt')
+            template: An already parsed maze, e.g. from a level pack.
+            profile: If True, count and time the operations in PROFILED_METHODS
+                        (see get_profile). If False, the methods are left
+                        untouched and profiling costs nothing.
         """
         self._maze_file = maze_file
+        self._template = template
+        self._profile = None
+        # The template of the previous reset, whose tile view and stuck crates
+        # can be reused by the next reset
+        self._reset_template = None
+        self._grid = None
+        if profile:
+            self._profile = {}
+            for name, method in self.PROFILED_METHODS.items():
+                setattr(self, method, self._profiled(name,
+                                                     getattr(self, method)))
         self.reset()
 
     def reset(self) -> None:
-        """ Resets the model to its initial state. """
-        raw_maze, player_stats = read_file(self._maze_file)
-        self._maze, self._entities, self._player_position = convert_maze(
-            raw_maze)
-        self._player = Player(*player_stats)
-
-        self._last_state = {
-            'maze': [[item for item in row] for row in self._maze],
-            'entities': {key: value for key, value in self._entities.items()},
-            'player_stats': player_stats,
-            'player_position': self._player_position,
-            'last_filled': None,
+        """ Resets the model to its initial state.
+
+            Resetting again from the same template is done in place: the tile
+            view returned by get_maze and the unfilled goal positions are kept,
+            with only the goals filled or emptied since the last reset
+            restored, so the cost depends on the entities and moves made
+            rather than the area of the maze.
+        """
+        template = self._template
+        if template is None:
+            template = load_maze_template(self._maze_file)
+        same_template = template is self._reset_template
+        self._reset_template = template
+
+        self._rows, self._cols = template.dimensions
+        self._tiles = template.tiles
+        self._neighbours = template.neighbours
+        self._push_targets = template.push_targets
+        self._filled = bytearray(template.filled)
+        self._entities = dict(template.entities)
+        # The entities of each type, kept in sync with self._entities by
+        # _add_entity and _remove_entity
+        self._entities_by_type = {
+            entity_type: dict(group)
+            for entity_type, group in template.entities_by_type
         }
+        self._player_position = template.player_position
+        if same_template:
+            for index in self._changed_goals:
+                position = row, col = divmod(index, self._cols)
+                if self._is_filled(index):
+                    self._unfilled_goal_positions.discard(position)
+                else:
+                    self._unfilled_goal_positions.add(position)
+                if self._grid is not None:
+                    tile = self._grid[row][col]
+                    if self._is_filled(index):
+                        tile.fill()
+                    else:
+                        tile.unfill()
+        else:
+            self._grid = None
+            self._unfilled_goal_positions = {
+                (row, col) for row, col in template.goal_positions
+                if not self._is_filled(row * self._cols + col)
+            }
+        self._changed_goals = set()
+        self._player = Player(*template.player_stats)
+
+        self._history = []
+        self._redo_history = []
+        self._hash = template.board_hash
+
+        # Crates which can never fill a goal, because they are on a dead
+        # square or frozen in place
+        self._dead_squares = template.dead_squares
+        if same_template:
+            self._stuck_crates = set(self._initial_stuck_crates)
+        else:
+            self._stuck_crates = set()
+            self._refresh_stuck_crates(list(self._entities))
+            self._initial_stuck_crates = frozenset(self._stuck_crates)
+
+        # The player's reachable region, computed lazily and discarded
+        # whenever an entity is added or removed
+        self._reachable = None
+        self._normalized_position = None
+
+        # The cells changed since pop_changed_cells was last called, or None
+        # if every cell may have changed
+        self._changed_cells = None
+
+    def get_profile(self) -> dict[str, dict[str, int | float]] | None:
+        """ Returns a snapshot of the profiling counters, or None if the model
+            was not constructed with profile=True.
+
+            The snapshot maps each name in PROFILED_METHODS to a dictionary
+            with the number of 'calls', the number of 'successes' (calls which
+            did not return False) and the cumulative 'seconds' spent. Potions
+            count both those picked up and those bought. Counters persist
+            across resets.
+        """
+        if self._profile is None:
+            return None
+        return {name: dict(counters)
+                for name, counters in self._profile.items()}
+
+    def get_template(self) -> MazeTemplate:
+        """ Returns the template the model was last reset from. """
+        return self._reset_template
 
     def get_shop_items(self) -> dict[str, int]:
         """ Returns a dictionary mapping item names to their cost. """
@@ -311,18 +859,38 @@ class SokobanModel:
         if self._player.get_money() < self.ITEM_COSTS.get(item):
             return False
 
+        strength, moves, money = self._get_player_stats()
         self._player.add_money(-self.ITEM_COSTS[item])
-        self._entities[self._player_position] = ENTITY_IDS_TO_CLASS[item]()
+        self._add_entity(self._player_position, make_entity(item))
         self._handle_potion(self._player_position)
+
+        self._record(Delta(
+            self._player_position, self._player_position, None, None, None,
+            None, None, self._player.get_strength() - strength,
+            self._player.get_moves_remaining() - moves,
+            self._player.get_money() - money,
+        ))
         return True
 
     def get_maze(self) -> Grid:
-        """ Returns the maze. """
-        return self._maze
+        """ Returns the maze as a list of lists (rows) of tile objects. The
+            tile objects are built from the compact board on first use and
+            kept in sync with it afterwards.
+        """
+        if self._grid is None:
+            self._grid = []
+            for row in range(self._rows):
+                new_row = []
+                for index in range(row * self._cols, (row + 1) * self._cols):
+                    new_row.append(make_tile(
+                        FILLED_GOAL if self._is_filled(index)
+                        else CODE_TO_TILE_ID[self._tiles[index]]))
+                self._grid.append(new_row)
+        return self._grid
 
     def get_dimensions(self) -> tuple[int, int]:
         """ Returns the dimensions of the maze as (#rows, #columns). """
-        return len(self._maze), len(self._maze[0])
+        return self._rows, self._cols
 
     def get_entities(self) -> Entities:
         """ Returns a dictionary mapping (row, col) positions to the entities at
@@ -331,6 +899,33 @@ class SokobanModel:
         """
         return self._entities
 
+    def get_entities_of_type(self, entity_type: str) -> Entities:
+        """ Returns a dictionary mapping positions to the entities of the given
+            type (CRATE, COIN or the id of a potion). The dictionary is kept in
+            sync with get_entities, so this takes constant time. It must not
+            be modified.
+
+        Parameters:
+            entity_type: The type of entity to find.
+        """
+        return self._entities_by_type[entity_type]
+
+    def get_crate_strengths(self) -> dict[Position, int]:
+        """ Returns a dictionary mapping the positions of the crates left to
+            their strengths. This takes time proportional to the number of
+            crates, not the size of the maze.
+        """
+        return {position: crate.get_strength() for position, crate
+                in self._entities_by_type[CRATE].items()}
+
+    def get_goal_positions(self) -> tuple[Position, ...]:
+        """ Returns the positions of every goal, filled or not. """
+        return self._reset_template.goal_positions
+
+    def get_unfilled_goal_positions(self) -> frozenset[Position]:
+        """ Returns the positions of the goals which are not yet filled. """
+        return frozenset(self._unfilled_goal_positions)
+
     def get_player_position(self) -> Position:
         """ Returns the player's current position. """
         return self._player_position
@@ -347,54 +942,136 @@ class SokobanModel:
         """ Returns the amount of money the player has. """
         return self._player.get_money()
 
-    def undo_move(self) -> None:
-        """ Undoes the last valid move made by the player. """
-        self._maze = self._last_state['maze']
-        self._entities = self._last_state['entities']
-        self._player_position = self._last_state['player_position']
-        self._player = Player(*self._last_state['player_stats'])
-        if self._last_state['last_filled'] is not None:
-            row, col = self._last_state['last_filled']
-            self._get_tile(row, col).unfill()
+    def state_hash(self) -> int:
+        """ Returns a 64-bit Zobrist hash of the full game state: the player's
+            position and stats, the remaining entities and the filled goals.
+            Equal states always have equal hashes. The hash is maintained
+            incrementally, so this is a constant time operation.
+        """
+        return (self._hash
+                ^ zobrist_key(STRENGTH_FEATURE, 0, self._player.get_strength())
+                ^ zobrist_key(MOVES_FEATURE, 0,
+                              self._player.get_moves_remaining())
+                ^ zobrist_key(MONEY_FEATURE, 0, self._player.get_money()))
+
+    def pop_changed_cells(self) -> set[Position] | None:
+        """ Returns the cells whose drawing may have changed since this was
+            last called, and starts collecting changes afresh. Each move,
+            purchase, undo or redo changes at most three cells: where the
+            player was, where the player is, and where a crate was pushed to
+            or pulled back from.
+
+        Returns:
+            The changed (row, col) positions, or None if the model has been
+            reset since the last call, so that every cell may have changed.
+        """
+        cells = self._changed_cells
+        self._changed_cells = set()
+        return cells
+
+    def can_undo(self) -> bool:
+        """ Returns True iff there is a move or purchase that can be undone. """
+        return bool(self._history)
+
+    def can_redo(self) -> bool:
+        """ Returns True iff there is an undone move or purchase which can be
+            redone.
+        """
+        return bool(self._redo_history)
+
+    def undo_move(self) -> bool:
+        """ Undoes the last valid move or purchase made by the player. Any
+            number of actions may be undone, back to the start of the game.
+
+        Returns:
+            True iff there was an action to undo.
+        """
+        if not self._history:
+            return False
+
+        delta = self._history.pop()
+        self._player.add_strength(-delta.strength)
+        self._player.add_moves_remaining(-delta.moves)
+        self._player.add_money(-delta.money)
+
+        if delta.consumed is not None:
+            self._add_entity(delta.new_position, delta.consumed)
+
+        if delta.crate is not None:
+            if delta.filled is not None:
+                self._set_filled(delta.filled, False)
+            else:
+                self._remove_entity(delta.crate_to)
+            self._add_entity(delta.crate_from, delta.crate)
+            self._refresh_stuck_crates([delta.crate_from, delta.crate_to])
+
+        self._move_player(delta.old_position)
+        self._redo_history.append(delta)
+        self._mark_changed(delta)
+        return True
+
+    def redo_move(self) -> bool:
+        """ Redoes the last move or purchase undone by undo_move. The redo
+            history is discarded whenever a new move or purchase is made.
+
+        Returns:
+            True iff there was an action to redo.
+        """
+        if not self._redo_history:
+            return False
+
+        delta = self._redo_history.pop()
+        if delta.crate is not None:
+            self._remove_entity(delta.crate_from)
+            if delta.filled is not None:
+                self._set_filled(delta.filled, True)
+            else:
+                self._add_entity(delta.crate_to, delta.crate)
+            self._refresh_stuck_crates([delta.crate_from, delta.crate_to])
+
+        if delta.consumed is not None:
+            self._remove_entity(delta.new_position)
+
+        self._player.add_strength(delta.strength)
+        self._player.add_moves_remaining(delta.moves)
+        self._player.add_money(delta.money)
+
+        self._move_player(delta.new_position)
+        self._history.append(delta)
+        self._mark_changed(delta)
+        return True
 
     def attempt_move(self, direction: str) -> bool:
         """ Attempts to move the player in the given direction.
 
         Parameters:
             direction: The direction to move in. This should be one of the
-                        constants UP, DOWN, LEFT or RIGHT, or 'u' for undo.
+                        constants UP, DOWN, LEFT or RIGHT, or UNDO / REDO.
 
         Returns:
             True iff the move was successful.
         """
-        # Handle undo move
-        if direction == 'u':
-            self.undo_move()
-            return True
-
-        # Make a copy of important information about this state to overwrite
-        # self._last_state if the move is successful
-        last_state = {
-            'maze': [[item for item in row] for row in self._maze],
-            'entities': {key: value for key, value in self._entities.items()},
-            'player_stats': (self._player.get_strength(),
-                             self._player.get_moves_remaining()),
-            'player_position': self._player_position,
-            'last_filled': None,
-        }
+        # Handle undo and redo moves
+        if direction == UNDO:
+            return self.undo_move()
+        if direction == REDO:
+            return self.redo_move()
 
         # Handle directional move
-        if not DIRECTION_DELTAS.get(direction):
+        d = DIRECTION_INDICES.get(direction)
+        if d is None:
             return False
 
-        new_position = new_row, new_col = self._get_new_position(
-            self._player_position, direction)
-
-        if not self._in_bounds(new_row, new_col):
+        # A wall or the edge of the maze gives NO_CELL
+        row, col = self._player_position
+        index = row * self._cols + col
+        target = self._neighbours[d][index]
+        if target == NO_CELL:
             return False
+        new_position = divmod(target, self._cols)
 
-        if self._get_tile(new_row, new_col).is_blocking():
-            return False
+        strength, moves, money = self._get_player_stats()
+        crate = crate_to = filled = consumed = None
 
         # Handle case where there is a crate in the new position
         entity_present = self._entities.get(new_position)
@@ -402,57 +1079,372 @@ class SokobanModel:
             if entity_present.get_type() == CRATE:
                 if not self._attempt_push(new_position, direction):
                     return False
+                crate = entity_present
+                landing = self._push_targets[d][index]
+                crate_to = divmod(landing, self._cols)
+                if crate_to not in self._entities:
+                    filled = landing
             elif entity_present.get_type() == COIN:
+                consumed = entity_present
                 self._player.add_money(COIN_AMOUNT)
-                self._entities.pop(new_position)
+                self._remove_entity(new_position)
 
             elif isinstance(entity_present, Potion):
+                consumed = entity_present
                 self._handle_potion(new_position)
 
-        self._player_position = new_position
+        old_position = self._player_position
+        self._move_player(new_position)
         self._player.add_moves_remaining(-1)
 
-        self._last_state = last_state
+        self._record(Delta(
+            old_position, new_position, crate,
+            None if crate is None else new_position, crate_to, filled,
+            consumed, self._player.get_strength() - strength,
+            self._player.get_moves_remaining() - moves,
+            self._player.get_money() - money,
+        ))
         return True
 
+    def apply_moves(
+        self,
+        moves: str,
+        stop_on_invalid: bool = False
+    ) -> tuple[list[bool], dict]:
+        """ Attempts each move in the given sequence in turn, as attempt_move
+            would. Replay stops early once the game is over (the player has won
+            or has no moves remaining), as in the interactive games.
+
+        Parameters:
+            moves: The sequence of moves, e.g. 'ddsw'. Each character may be
+                    any move accepted by attempt_move, including UNDO and REDO.
+            stop_on_invalid: If True, stop at the first unsuccessful move.
+
+        Returns:
+            A tuple containing two items:
+                1) Whether each attempted move was successful, in order. Moves
+                    after the point where replay stopped are not included.
+                2) The final state of the game, as returned by get_state.
+        """
+        results = []
+        attempt_move = self.attempt_move
+        player = self._player
+        for move in moves:
+            if (not self._unfilled_goal_positions
+                    or player.get_moves_remaining() <= 0):
+                break
+            success = attempt_move(move)
+            results.append(success)
+            if stop_on_invalid and not success:
+                break
+        return results, self.get_state()
+
+    def get_state(self) -> dict:
+        """ Returns a summary of the current game state, as a dictionary with
+            keys 'player_position', 'strength', 'moves_remaining', 'money',
+            'won' and 'hash'.
+        """
+        return {
+            'player_position': self._player_position,
+            'strength': self._player.get_strength(),
+            'moves_remaining': self._player.get_moves_remaining(),
+            'money': self._player.get_money(),
+            'won': not self._unfilled_goal_positions,
+            'hash': self.state_hash(),
+        }
+
+    def get_reachable_positions(self) -> frozenset[Position]:
+        """ Returns the positions the player can walk to from their current
+            position without pushing a crate or picking up a coin or potion.
+
+            The region is cached, and only recomputed after a crate moves or an
+            entity is picked up, placed or restored by undo.
+        """
+        if self._reachable is None:
+            self._update_reachable()
+        return self._reachable
+
+    def get_normalized_position(self) -> Position:
+        """ Returns a canonical position for the player's reachable region: the
+            top-most, then left-most, reachable position. Two states which
+            differ only by where the player stands in the same region have the
+            same normalized position.
+        """
+        if self._reachable is None:
+            self._update_reachable()
+        return self._normalized_position
+
+    def can_reach(self, position: Position) -> bool:
+        """ Returns True iff the player can walk to the given position without
+            pushing a crate or picking up a coin or potion.
+
+        Parameters:
+            position: The (row, col) position to check.
+        """
+        return position in self.get_reachable_positions()
+
+    def is_dead_square(self, position: Position) -> bool:
+        """ Returns True iff a crate at the given position could never be
+            pushed onto a goal which was unfilled at the start of the game.
+
+        Parameters:
+            position: The (row, col) position to check.
+        """
+        row, col = position
+        return (self._in_bounds(row, col)
+                and bool(self._dead_squares[row * self._cols + col]))
+
+    def is_deadlocked(self) -> bool:
+        """ Returns True iff the game can no longer be won, because too many
+            crates are on dead squares or frozen in place to fill the
+            remaining goals.
+        """
+        return (len(self._entities_by_type[CRATE]) - len(self._stuck_crates)
+                < len(self._unfilled_goal_positions))
+
     def has_won(self) -> bool:
         """ Returns True iff the player has won the game. """
-        for row in self._maze:
-            for tile in row:
-                if tile.get_type() == GOAL and not tile.is_filled():
-                    return False
-        return True
+        return not self._unfilled_goal_positions
 
-    def _get_new_position(self, position: Position, direction: str) -> Position:
-        """ Returns the new position for an entity if it were to move in the
-            given direction from the given position. This does not consider
-            whether the move is valid.
+    def _profiled(self, name: str, method: Callable) -> Callable:
+        """ Returns a wrapper around the given bound method which updates the
+            profiling counters for the named operation.
 
         Parameters:
-            position: The current (row, column) position.
-            direction: The direction in which to move. This should be one of the
-                        constants UP, DOWN, LEFT or RIGHT.
+            name: The name of the operation in PROFILED_METHODS.
+            method: The bound method to wrap.
+        """
+        counters = self._profile[name] = {
+            'calls': 0, 'successes': 0, 'seconds': 0.0,
+        }
+        clock = time.perf_counter
+
+        def wrapper(*args):
+            start = clock()
+            result = method(*args)
+            counters['seconds'] += clock() - start
+            counters['calls'] += 1
+            if result is not False:
+                counters['successes'] += 1
+            return result
+        return wrapper
+
+    def _get_player_stats(self) -> tuple[int, int, int]:
+        """ Returns the player's (strength, moves remaining, money). """
+        return (self._player.get_strength(),
+                self._player.get_moves_remaining(),
+                self._player.get_money())
+
+    def _record(self, delta: Delta) -> None:
+        """ Records the given delta of a new move or purchase in the history,
+            discarding any actions that could have been redone.
 
-        Returns:
-            The new (row, column) position for the entity.
+        Parameters:
+            delta: The changes made by the move or purchase.
         """
-        delta = DIRECTION_DELTAS.get(direction)
-        return position[0] + delta[0], position[1] + delta[1]
+        self._history.append(delta)
+        self._redo_history.clear()
+        self._mark_changed(delta)
 
-    def _get_tile(self, row: int, col: int) -> Tile:
-        """ Returns the tile at the given (row, col) position.
+    def _mark_changed(self, delta: Delta) -> None:
+        """ Adds the cells changed by the given delta to those reported by
+            pop_changed_cells.
 
         Parameters:
-            row: The row of the tile.
-            col: The column of the tile.
+            delta: The changes made by a move or purchase, or by undoing or
+                    redoing one.
+        """
+        if self._changed_cells is None:
+            return
+        self._changed_cells.add(delta.old_position)
+        self._changed_cells.add(delta.new_position)
+        if delta.crate_to is not None:
+            self._changed_cells.add(delta.crate_to)
 
-        Returns:
-            The tile at the given position.
+    def _player_key(self, position: Position) -> int:
+        """ Returns the Zobrist key for the player standing at the given
+            position.
 
-        Preconditions:
-            The given position is in bounds for the maze.
+        Parameters:
+            position: The (row, col) position of the player.
+        """
+        return zobrist_key(ord(PLAYER), position[0] * self._cols + position[1])
+
+    def _entity_key(self, position: Position, entity: Entity) -> int:
+        """ Returns the Zobrist key for the given entity at the given position.
+
+        Parameters:
+            position: The (row, col) position of the entity.
+            entity: The entity at that position.
+        """
+        return entity_key(position[0] * self._cols + position[1], entity)
+
+    def _move_player(self, position: Position) -> None:
+        """ Moves the player to the given position, updating the state hash.
+
+        Parameters:
+            position: The new (row, col) position of the player.
         """
-        return self._maze[row][col]
+        self._hash ^= (self._player_key(self._player_position)
+                       ^ self._player_key(position))
+        self._player_position = position
+
+    def _add_entity(self, position: Position, entity: Entity) -> None:
+        """ Places an entity at the given position, updating the state hash.
+
+        Parameters:
+            position: The (row, col) position to place the entity at.
+            entity: The entity to place. There must not already be an entity at
+                    this position.
+        """
+        self._entities[position] = entity
+        self._entities_by_type[entity.get_type()][position] = entity
+        self._hash ^= self._entity_key(position, entity)
+        self._reachable = None
+
+    def _remove_entity(self, position: Position) -> Entity:
+        """ Removes and returns the entity at the given position, updating the
+            state hash.
+
+        Parameters:
+            position: The (row, col) position of the entity to remove.
+        """
+        entity = self._entities.pop(position)
+        del self._entities_by_type[entity.get_type()][position]
+        self._hash ^= self._entity_key(position, entity)
+        self._reachable = None
+        return entity
+
+    def _update_reachable(self) -> None:
+        """ Flood fills the player's reachable region from their position,
+            treating walls and all entities as obstacles.
+        """
+        cols = self._cols
+        start = self._player_position[0] * cols + self._player_position[1]
+        blocked = {row * cols + col for row, col in self._entities}
+        blocked.add(NO_CELL)
+        seen = {start}
+        queue = [start]
+        for index in queue:
+            for table in self._neighbours:
+                new_index = table[index]
+                if new_index not in seen and new_index not in blocked:
+                    seen.add(new_index)
+                    queue.append(new_index)
+
+        self._reachable = frozenset(divmod(index, cols) for index in seen)
+        self._normalized_position = divmod(min(seen), cols)
+
+    def _is_crate(self, position: Position) -> bool:
+        """ Returns True iff there is a crate at the given position. """
+        return position in self._entities_by_type[CRATE]
+
+    def _refresh_stuck_crates(self, positions: list[Position]) -> None:
+        """ Re-evaluates whether crates are stuck after crates have moved to
+            or from the given positions. Only crates in groups of adjacent
+            crates touching these positions can have changed, since a crate's
+            freedom depends only on walls, dead squares and adjacent crates.
+
+        Parameters:
+            positions: The (row, col) positions where crates have changed.
+        """
+        pending = []
+        for row, col in positions:
+            self._stuck_crates.discard((row, col))
+            pending.append((row, col))
+            pending.extend((row + d_row, col + d_col)
+                           for d_row, d_col in DIRECTION_DELTAS.values())
+
+        group = set()
+        while pending:
+            position = pending.pop()
+            if position in group or not self._is_crate(position):
+                continue
+            group.add(position)
+            row, col = position
+            pending.extend((row + d_row, col + d_col)
+                           for d_row, d_col in DIRECTION_DELTAS.values())
+
+        for position in group:
+            if self.is_dead_square(position) or self._is_frozen(position,
+                                                                set()):
+                self._stuck_crates.add(position)
+            else:
+                self._stuck_crates.discard(position)
+
+    def _is_frozen(self, position: Position, walls: set[Position]) -> bool:
+        """ Returns True iff the crate at the given position can never be
+            pushed along either axis.
+
+            A crate with dead squares on both sides of an axis counts as
+            blocked along it only for the crate being checked, not for its
+            neighbours further down the recursion: it can still be pushed
+            onto one of those dead squares, which may free the neighbours.
+
+        Parameters:
+            position: The (row, col) position of the crate.
+            walls: Positions of crates to treat as walls, because they are
+                    already being checked further up the recursion. This is
+                    empty for the crate being checked.
+        """
+        checked = not walls
+        walls = walls | {position}
+        row, col = position
+        for d_row, d_col in ((0, 1), (1, 0)):
+            before = (row - d_row, col - d_col)
+            after = (row + d_row, col + d_col)
+            blocked = any(
+                not self._in_bounds(*side) or side in walls
+                or self._tiles[side[0] * self._cols + side[1]] == WALL_CODE
+                for side in (before, after)
+            )
+            blocked = blocked or (checked and self.is_dead_square(before)
+                                  and self.is_dead_square(after))
+            blocked = blocked or any(
+                self._is_crate(side) and self._is_frozen(side, walls)
+                for side in (before, after)
+            )
+            if not blocked:
+                return False
+        return True
+
+    def _is_filled(self, index: int) -> bool:
+        """ Returns True iff the cell at the given flat board index holds a
+            filled goal.
+
+        Parameters:
+            index: The row-major index of the cell (row * #columns + col).
+        """
+        return bool(self._filled[index >> 3] & (1 << (index & 7)))
+
+    def _set_filled(self, index: int, filled: bool) -> None:
+        """ Sets the filled state of the goal at the given flat board index,
+            updating the unfilled goal positions, the state hash and the tile
+            view returned by get_maze if it has been built.
+
+        Parameters:
+            index: The row-major index of the goal (row * #columns + col).
+            filled: True to fill the goal, False to unfill it.
+        """
+        if self._is_filled(index) == filled:
+            return
+
+        self._hash ^= zobrist_key(ord(FILLED_GOAL), index)
+        self._changed_goals.add(index)
+        if filled:
+            self._filled[index >> 3] |= 1 << (index & 7)
+            self._unfilled_goal_positions.discard(divmod(index, self._cols))
+        else:
+            self._filled[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+            self._unfilled_goal_positions.add(divmod(index, self._cols))
+
+        if self._grid is not None:
+            row, col = divmod(index, self._cols)
+            tile = self._grid[row][col]
+            if filled:
+                tile.fill()
+            else:
+                tile.unfill()
 
     def _in_bounds(self, row: int, col: int) -> bool:
         """ Returns True iff the given (row, col) position is in bounds for the
@@ -465,7 +1457,7 @@ class SokobanModel:
         Returns:
             True iff the given position is in bounds for the maze.
         """
-        return 0 <= row < len(self._maze) and 0 <= col < len(self._maze[0])
+        return 0 <= row < self._rows and 0 <= col < self._cols
 
     def _attempt_push(self, position: Position, direction: str) -> bool:
         """ Attempts to push a crate from the given position in the given
@@ -479,15 +1471,14 @@ class SokobanModel:
         Returns:
             True iff the crate was successfully pushed.
         """
-        new_row, new_col = self._get_new_position(position, direction)
-        tile = self._get_tile(new_row, new_col)
+        index = self._neighbours[DIRECTION_INDICES[direction]][
+            position[0] * self._cols + position[1]]
 
         # If the new position is out of bounds, or contains a blocking tile or
         # entity, return False
-        if not self._in_bounds(new_row, new_col):
-            return False
-        if tile.is_blocking():
+        if index == NO_CELL:
             return False
+        new_row, new_col = divmod(index, self._cols)
         if (new_row, new_col) in self._entities:
             return False
 
@@ -496,17 +1487,17 @@ class SokobanModel:
         if crate_strength > self._player.get_strength():
             return False
 
-        crate = self._entities.pop(position)
+        crate = self._remove_entity(position)
 
         # If the crate would fill an unfilled goal, do so and don't add the
-        # crate back to the entities
-        if tile.get_type() == GOAL and not tile.is_filled():
-            tile.fill()
-            self._last_state['last_filled'] = (new_row, new_col)
-            return True
-
-        # Otherwise, add the crate back to the entities
-        self._entities[(new_row, new_col)] = crate
+        # crate back to the entities. Otherwise, add the crate back.
+        if self._tiles[index] == GOAL_CODE and not self._is_filled(index):
+            self._set_filled(index, True)
+        else:
+            self._add_entity((new_row, new_col), crate)
+
+        # Check whether this push has frozen the crate (and its neighbours)
+        self._refresh_stuck_crates([position, (new_row, new_col)])
         return True
 
     def _handle_potion(self, position: tuple[int, int]) -> None:
@@ -516,5 +1507,5 @@ class SokobanModel:
         Parameters:
             position: The position of the potion.
         """
-        potion = self._entities.pop(position)
+        potion = self._remove_entity(position)
         self._player.apply_effect(potion.effect())
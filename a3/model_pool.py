@@ -0,0 +1,136 @@
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from model import MazeTemplate, SokobanModel, load_maze_template
+
+DEFAULT_MAX_IDLE = 64
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+
+class ModelPool:
+    """ A pool of SokobanModels which are reused between games.
+
+    Models are handed out by acquire and given back with release, which resets
+    them in place. A model acquired again for the same template skips building
+    its tile view and stuck crates, so starting a game costs about the same
+    however large the maze is. At most max_idle released models are kept, and
+    models left idle for longer than idle_timeout seconds are evicted, least
+    recently released first.
+    """
+
+    def __init__(
+        self,
+        max_idle: int = DEFAULT_MAX_IDLE,
+        idle_timeout: float | None = DEFAULT_IDLE_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """ Constructor for ModelPool.
+
+        Parameters:
+            max_idle: The most released models to keep, across all templates.
+            idle_timeout: The seconds a released model is kept for, or None to
+                            keep models until the pool is full.
+            clock: Returns the current time in seconds.
+        """
+        self._max_idle = max_idle
+        self._idle_timeout = idle_timeout
+        self._clock = clock
+
+        # Idle models in the order they were released, keyed by id, with the
+        # template they belong to and the time they were released
+        self._idle = OrderedDict()
+        # The ids of the idle models for each template, keyed by the
+        # template's id. Idle models keep their template alive, so its id is
+        # not reused while it has an entry here.
+        self._idle_by_template = {}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __len__(self) -> int:
+        """ Returns the number of idle models in the pool. """
+        return len(self._idle)
+
+    def acquire(
+        self,
+        maze_file: str | None = None,
+        template: MazeTemplate | None = None
+    ) -> SokobanModel:
+        """ Returns a model in its initial state, reusing an idle model for the
+            same maze if there is one. Exactly one of maze_file and template
+            should be given.
+
+        Parameters:
+            maze_file: The path to the maze file (e.g. 'maze_files/maze1.txt')
+            template: An already parsed maze, e.g. from a level pack.
+        """
+        if template is None:
+            template = load_maze_template(maze_file)
+        self.evict_idle()
+
+        models = self._idle_by_template.get(id(template))
+        if models:
+            # Reuse the most recently released model, whose memory is most
+            # likely to still be cached
+            model_id, _ = models.popitem()
+            if not models:
+                del self._idle_by_template[id(template)]
+            self._stats['hits'] += 1
+            return self._idle.pop(model_id)[1]
+
+        self._stats['misses'] += 1
+        return SokobanModel(template=template)
+
+    def release(self, model: SokobanModel) -> None:
+        """ Resets a model acquired from this pool and keeps it for reuse.
+            The model must not be used again by the caller.
+
+        Parameters:
+            model: The model to give back.
+        """
+        if id(model) in self._idle:
+            return
+        model.reset()
+        template = model.get_template()
+        self._idle[id(model)] = (template, model, self._clock())
+        self._idle_by_template.setdefault(id(template), {})[id(model)] = None
+        self.evict_idle()
+        while len(self._idle) > self._max_idle:
+            self._evict_oldest()
+
+    def evict_idle(self) -> int:
+        """ Evicts every model which has been idle for longer than the idle
+            timeout.
+
+        Returns:
+            The number of models evicted.
+        """
+        if self._idle_timeout is None:
+            return 0
+        deadline = self._clock() - self._idle_timeout
+        evicted = 0
+        while self._idle and next(iter(self._idle.values()))[2] < deadline:
+            self._evict_oldest()
+            evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        """ Evicts every idle model. """
+        self._stats['evictions'] += len(self._idle)
+        self._idle.clear()
+        self._idle_by_template.clear()
+
+    def get_stats(self) -> dict[str, int]:
+        """ Returns counts of the acquisitions which reused a model ('hits'),
+            those which built a new one ('misses'), models evicted
+            ('evictions') and models currently idle ('idle').
+        """
+        return {**self._stats, 'idle': len(self._idle)}
+
+    def _evict_oldest(self) -> None:
+        """ Evicts the model which was released least recently. """
+        model_id, (template, _, _) = self._idle.popitem(last=False)
+        models = self._idle_by_template[id(template)]
+        del models[model_id]
+        if not models:
+            del self._idle_by_template[id(template)]
+        self._stats['evictions'] += 1
@@ -0,0 +1,384 @@
+""" Random playouts of Sokoban games, for estimating how hard a level is.
+
+Run from the a3 directory, e.g.
+    python playout.py maze_files/coin_maze.txt --playouts 100000 --workers 4
+"""
+import argparse
+import random
+import time
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from a2_support import *
+from model import COIN, COIN_AMOUNT, DIRECTIONS, ENTITY_IDS_TO_CLASS, \
+    NO_CELL, SokobanModel
+
+# Ways a playout can end
+WON = 'won'
+LOST = 'lost'
+DEADLOCKED = 'deadlocked'
+
+# The number of random actions tried in a row before checking whether any
+# action can succeed at all
+MAX_REJECTIONS = 16
+
+
+class PlayoutResult(NamedTuple):
+    """ The outcome of one playout. """
+    # WON, LOST (no moves remaining) or DEADLOCKED (too many crates are on
+    # dead squares to fill the remaining goals, or no action can succeed)
+    outcome: str
+    # The number of successful moves made
+    moves: int
+    # The number of each kind of potion picked up, keyed by potion id
+    potions: dict[str, int]
+    coins: int
+    # The number of each shop item bought, keyed by item id
+    purchases: dict[str, int]
+
+
+class PlayoutStats(NamedTuple):
+    """ A summary of many playouts from the same state. """
+    playouts: int
+    wins: int
+    losses: int
+    deadlocks: int
+    # The total number of successful moves and purchases made
+    steps: int
+    # Means per playout
+    mean_moves: float
+    mean_potions: dict[str, float]
+    mean_coins: float
+    mean_purchases: dict[str, float]
+    seconds: float
+
+    def get_win_rate(self) -> float:
+        """ Returns the fraction of playouts which were won. """
+        return self.wins / self.playouts if self.playouts else 0.0
+
+
+class PlayoutEngine:
+    """ Plays random games to the end from a snapshot of a SokobanModel.
+
+    The rules are those of SokobanModel, but a playout works on flat board
+    indices and plain dictionaries copied once per playout, and records no
+    history, so each step is a few lookups. Actions are drawn at random,
+    weighted by the weights given, and only successful actions count as
+    steps. Deadlock is detected with the model's dead squares, so a playout
+    ends as soon as a crate is pushed where it can never fill a goal.
+    """
+
+    def __init__(
+        self,
+        model: SokobanModel,
+        weights: dict[str, float] | None = None
+    ) -> None:
+        """ Constructor for PlayoutEngine. Later changes to the model do not
+            affect the engine.
+
+        Parameters:
+            model: The model whose current state playouts start from.
+            weights: Maps each action (UP, DOWN, LEFT, RIGHT or a shop item id)
+                        to its relative chance of being chosen. Actions not
+                        given are never chosen. By default the four moves are
+                        equally likely and nothing is bought.
+        """
+        if weights is None:
+            weights = {direction: 1 for direction in DIRECTIONS}
+        shop = model.get_shop_items()
+        for action in weights:
+            if action not in DIRECTIONS and action not in shop:
+                raise ValueError(f'unknown action {action!r}')
+        self._actions = [action for action, weight in weights.items()
+                         if weight > 0]
+        if not self._actions:
+            raise ValueError('no action has a positive weight')
+        self._cum_weights = []
+        total = 0
+        for action in self._actions:
+            total += weights[action]
+            self._cum_weights.append(total)
+        self._total_weight = total
+
+        # Actions as ints: a direction index, or -1 - the index of a purchase
+        self._purchases = [
+            (item, shop[item], ENTITY_IDS_TO_CLASS[item].EFFECT)
+            for item in self._actions if item in shop
+        ]
+        purchase_ids = {item: -1 - i
+                        for i, (item, _, _) in enumerate(self._purchases)}
+        self._action_ids = [
+            DIRECTIONS.index(action) if action in DIRECTIONS
+            else purchase_ids[action]
+            for action in self._actions
+        ]
+
+        rows, cols = model.get_dimensions()
+        self._cols = cols
+        template = model.get_template()
+        self._neighbours = template.neighbours
+        self._push_targets = template.push_targets
+        self._dead = [model.is_dead_square(divmod(index, cols))
+                      for index in range(rows * cols)]
+        self._open_goals = frozenset(
+            row * cols + col
+            for row, col in model.get_unfilled_goal_positions()
+        )
+
+        # Items are (strength, moves, money, kind), where kind indexes
+        # self._kinds, for counting pickups
+        self._kinds = []
+        self._crates = {}
+        self._items = {}
+        for (row, col), entity in model.get_entities().items():
+            index = row * cols + col
+            if entity.get_type() == CRATE:
+                self._crates[index] = entity.get_strength()
+                continue
+            if entity.get_type() not in self._kinds:
+                self._kinds.append(entity.get_type())
+            kind = self._kinds.index(entity.get_type())
+            if entity.get_type() == COIN:
+                self._items[index] = (0, 0, COIN_AMOUNT, kind)
+            else:
+                effect = entity.effect()
+                self._items[index] = (effect.get('strength', 0),
+                                      effect.get('moves', 0), 0, kind)
+
+        self._free_crates = sum(not self._dead[index]
+                                for index in self._crates)
+
+        row, col = model.get_player_position()
+        self._player = row * cols + col
+        self._stats = (model.get_player_strength(),
+                       model.get_player_moves_remaining(),
+                       model.get_player_money())
+        self._deadlocked = model.is_deadlocked()
+
+    def playout(self, rng: random.Random) -> PlayoutResult:
+        """ Plays one random game to the end.
+
+        Parameters:
+            rng: The source of randomness.
+        """
+        neighbours, push_targets = self._neighbours, self._push_targets
+        dead, open_goals = self._dead, self._open_goals
+        purchases = self._purchases
+        action_ids, cum_weights = self._action_ids, self._cum_weights
+        total_weight = self._total_weight
+        choose = rng.random
+        crates = self._crates.copy()
+        items = self._items.copy()
+        filled = set()
+        player = self._player
+        strength, moves, money = self._stats
+        pickups = [0] * len(self._kinds)
+        bought = [0] * len(purchases)
+        unfilled = len(open_goals)
+        free_crates = self._free_crates
+        made = 0
+        rejections = 0
+
+        while True:
+            if unfilled == 0:
+                outcome = WON
+                break
+            if moves <= 0:
+                outcome = LOST
+                break
+            if free_crates < unfilled or self._deadlocked:
+                outcome = DEADLOCKED
+                break
+            if rejections >= MAX_REJECTIONS:
+                if not self._can_act(player, crates, items, strength, money):
+                    outcome = DEADLOCKED
+                    break
+                rejections = 0
+
+            if len(action_ids) == 1:
+                action = action_ids[0]
+            else:
+                action = action_ids[bisect(cum_weights,
+                                           choose() * total_weight)]
+
+            if action < 0:
+                _, cost, effect = purchases[-1 - action]
+                if money < cost:
+                    rejections += 1
+                    continue
+                money -= cost
+                strength += effect.get('strength', 0)
+                moves += effect.get('moves', 0)
+                bought[-1 - action] += 1
+                rejections = 0
+                continue
+
+            target = neighbours[action][player]
+            if target == NO_CELL:
+                rejections += 1
+                continue
+            crate = crates.get(target)
+            if crate is not None:
+                beyond = push_targets[action][player]
+                if (beyond == NO_CELL or beyond in crates or beyond in items
+                        or crate > strength):
+                    rejections += 1
+                    continue
+                del crates[target]
+                free_crates -= not dead[target]
+                if beyond in open_goals and beyond not in filled:
+                    filled.add(beyond)
+                    unfilled -= 1
+                else:
+                    crates[beyond] = crate
+                    free_crates += not dead[beyond]
+            else:
+                item = items.pop(target, None)
+                if item is not None:
+                    strength += item[0]
+                    moves += item[1]
+                    money += item[2]
+                    pickups[item[3]] += 1
+
+            player = target
+            moves -= 1
+            made += 1
+            rejections = 0
+
+        potions = {kind: count for kind, count in zip(self._kinds, pickups)
+                   if kind != COIN}
+        coins = (pickups[self._kinds.index(COIN)]
+                 if COIN in self._kinds else 0)
+        return PlayoutResult(
+            outcome, made, potions, coins,
+            {item: count for (item, _, _), count in zip(purchases, bought)},
+        )
+
+    def run(
+        self,
+        playouts: int,
+        seed: int | None = None,
+        workers: int = 1
+    ) -> PlayoutStats:
+        """ Plays many random games and summarises them.
+
+        Parameters:
+            playouts: The number of games to play.
+            seed: The seed for the random number generator, or None for a
+                    random seed. Results depend on both the seed and the
+                    number of workers.
+            workers: The number of processes to play games in. With 1
+                        worker, games are played in this process.
+        """
+        start_time = time.perf_counter()
+        if workers <= 1:
+            totals = self._run(playouts, seed)
+        else:
+            rng = random.Random(seed)
+            shares = [playouts // workers + (i < playouts % workers)
+                      for i in range(workers)]
+            seeds = [rng.getrandbits(64) for _ in shares]
+            with ProcessPoolExecutor(workers) as executor:
+                parts = list(executor.map(self._run, shares, seeds))
+            totals = parts[0]
+            for part in parts[1:]:
+                for name, total in part.items():
+                    if isinstance(total, dict):
+                        for key, count in total.items():
+                            totals[name][key] += count
+                    else:
+                        totals[name] += total
+
+        share = 1 / playouts if playouts else 0.0
+        return PlayoutStats(
+            playouts, totals[WON], totals[LOST], totals[DEADLOCKED],
+            totals['steps'], totals['moves'] * share,
+            {kind: count * share for kind, count in totals['potions'].items()},
+            totals['coins'] * share,
+            {item: count * share
+             for item, count in totals['purchases'].items()},
+            time.perf_counter() - start_time,
+        )
+
+    def _run(self, playouts: int, seed: int | None) -> dict:
+        """ Plays the given number of games in this process, and returns the
+            number of each outcome and the totals over all the games.
+        """
+        rng = random.Random(seed)
+        totals = {WON: 0, LOST: 0, DEADLOCKED: 0, 'steps': 0, 'moves': 0,
+                  'coins': 0,
+                  'potions': {kind: 0 for kind in self._kinds if kind != COIN},
+                  'purchases': {item: 0 for item, _, _ in self._purchases}}
+        potions, purchases = totals['potions'], totals['purchases']
+        for _ in range(playouts):
+            result = self.playout(rng)
+            totals[result.outcome] += 1
+            totals['moves'] += result.moves
+            totals['coins'] += result.coins
+            totals['steps'] += result.moves + sum(result.purchases.values())
+            for kind, count in result.potions.items():
+                potions[kind] += count
+            for item, count in result.purchases.items():
+                purchases[item] += count
+        return totals
+
+    def _can_act(self, player: int, crates: dict[int, int],
+                 items: dict[int, tuple], strength: int, money: int) -> bool:
+        """ Returns True iff any action with a positive weight can succeed from
+            the given position and stats.
+        """
+        for action in self._action_ids:
+            if action < 0:
+                if money >= self._purchases[-1 - action][1]:
+                    return True
+                continue
+            target = self._neighbours[action][player]
+            if target == NO_CELL:
+                continue
+            crate = crates.get(target)
+            if crate is None:
+                return True
+            beyond = self._push_targets[action][player]
+            if (beyond != NO_CELL and beyond not in crates
+                    and beyond not in items and crate <= strength):
+                return True
+        return False
+
+
+def main() -> None:
+    """ Runs playouts from the start of the maze given on the command line and
+        prints a summary.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('maze_file', help='the maze to play')
+    parser.add_argument('--playouts', type=int, default=10000,
+                        help='the number of games to play')
+    parser.add_argument('--seed', type=int, help='the random seed')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='the number of processes to play games in')
+    parser.add_argument('--buy', action='store_true',
+                        help='also buy shop items at random')
+    args = parser.parse_args()
+
+    model = SokobanModel(args.maze_file)
+    weights = None
+    if args.buy:
+        weights = {direction: 1 for direction in DIRECTIONS}
+        weights.update((item, 1) for item in model.get_shop_items())
+    stats = PlayoutEngine(model, weights).run(args.playouts, args.seed,
+                                              args.workers)
+    print(f'{stats.playouts} playouts in {stats.seconds:.2f}s '
+          f'({stats.steps / max(stats.seconds, 1e-9):.0f} steps/sec)')
+    print(f'win rate: {stats.get_win_rate():.4f} ({stats.wins} won, '
+          f'{stats.losses} lost, {stats.deadlocks} deadlocked)')
+    print(f'mean moves: {stats.mean_moves:.2f}')
+    print(f'mean coins: {stats.mean_coins:.3f}')
+    for kind, mean in stats.mean_potions.items():
+        print(f'mean {kind} potions: {mean:.3f}')
+    for item, mean in stats.mean_purchases.items():
+        print(f'mean {item} bought: {mean:.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+""" A headless Sokoban server hosting many concurrent games over a socket.
+
+Run from the a3 directory, e.g.
+    python server.py --port 7030
+    python server.py --unix /tmp/sokoban.sock
+
+Every connection is one session, with its own SokobanModel held in memory.
+All sessions run on a single asyncio event loop, so thousands of players can
+be connected at once without a thread per session. Levels are parsed once and
+shared between sessions through load_maze_template, and the models of ended
+games are reset and reused through a ModelPool.
+
+The protocol is line based. Each command is one line, and is answered by any
+number of data lines followed by exactly one status line: 'ok', 'invalid' (the
+command was understood but the move or purchase failed) or 'error <reason>'.
+
+Commands:
+    levels              List the levels which can be loaded.
+    load <level>        Start a new game on a level, e.g. 'load maze1'.
+    move <moves>        Make one or more moves, e.g. 'move ddsw'. Moves stop at
+                        the first invalid move, or when the game ends.
+    undo / redo         Undo or redo the last move or purchase.
+    buy <item>          Buy a shop item, e.g. 'buy S'.
+    reset               Restart the current level.
+    board               Send the whole board.
+    state               Send the player's stats.
+    quit                Close the connection.
+
+Data lines:
+    level <name>                    One per level, in reply to 'levels'.
+    board <rows> <cols>             Followed by one line per row of the board,
+                                    drawn as in maze files.
+    diff <row>,<col>,<char> ...     The cells which changed since the board was
+                                    last sent, e.g. 'diff 1,1,  1,2,P'. Each
+                                    char is exactly one character, and may
+                                    be a space.
+    state <moves> <strength> <money> <status>
+                                    The status is 'playing', 'won' or 'lost'.
+"""
+import argparse
+import asyncio
+import os
+
+from a2_support import *
+from model import REDO, UNDO, SokobanModel, load_maze_template
+from model_pool import ModelPool
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7030
+DEFAULT_MAZE_DIR = 'maze_files'
+MAZE_SUFFIX = '.txt'
+
+# The longest command line accepted, in bytes
+MAX_LINE = 4096
+
+OK = 'ok'
+INVALID = 'invalid'
+PLAYING = 'playing'
+WON = 'won'
+LOST = 'lost'
+
+
+class CommandError(Exception):
+    """ Raised when a command cannot be carried out. The message is sent to
+        the client.
+    """
+
+
+class GameSession:
+    """ The state of one player's connection: the game being played and the
+        board as the client last saw it.
+
+        Sessions know nothing about sockets, so the protocol can be driven
+        directly (e.g. from tests) through handle_command.
+    """
+
+    def __init__(self, maze_dir: str, pool: ModelPool | None = None) -> None:
+        """ Constructor for GameSession.
+
+        Parameters:
+            maze_dir: The directory levels are loaded from.
+            pool: The pool models are taken from and given back to, or None to
+                    build a new model for every game.
+        """
+        self._maze_dir = maze_dir
+        self._pool = pool
+        self._model = None
+        # The board as last sent to the client, as lists of characters
+        self._board = None
+
+    def handle_command(self, line: str) -> list[str]:
+        """ Carries out one command and returns the reply lines, ending with
+            the status line.
+
+        Parameters:
+            line: The command, without its line ending.
+        """
+        command, _, argument = line.strip().partition(' ')
+        handler = getattr(self, f'_command_{command}', None)
+        if handler is None:
+            return [f'error unknown command {command!r}']
+        reply = []
+        try:
+            success = handler(argument.strip(), reply)
+        except CommandError as error:
+            return reply + [f'error {error}']
+        return reply + [OK if success else INVALID]
+
+    def close(self) -> None:
+        """ Ends the session, giving its model back to the pool. """
+        if self._model is not None and self._pool is not None:
+            self._pool.release(self._model)
+        self._model = None
+
+    def _command_levels(self, argument: str, reply: list[str]) -> bool:
+        """ Lists the levels in the maze directory. """
+        for name in sorted(os.listdir(self._maze_dir)):
+            if name.endswith(MAZE_SUFFIX):
+                reply.append(f'level {name[:-len(MAZE_SUFFIX)]}')
+        return True
+
+    def _command_load(self, argument: str, reply: list[str]) -> bool:
+        """ Starts a new game on the named level. """
+        # Only plain names are accepted, so clients cannot read other files
+        if not argument or argument != os.path.basename(argument) \
+                or argument.startswith('.'):
+            raise CommandError(f'bad level name {argument!r}')
+        maze_file = os.path.join(self._maze_dir, argument + MAZE_SUFFIX)
+        try:
+            template = load_maze_template(maze_file)
+        except OSError:
+            raise CommandError(f'no level named {argument!r}') from None
+        except (ValueError, IndexError) as error:
+            # e.g. a bad header line, or no player in the maze
+            raise CommandError(f'level {argument!r} is malformed: {error}') \
+                from None
+        self.close()
+        if self._pool is None:
+            self._model = SokobanModel(template=template)
+        else:
+            self._model = self._pool.acquire(template=template)
+        self._send_board(reply)
+        self._send_state(reply)
+        return True
+
+    def _command_move(self, argument: str, reply: list[str]) -> bool:
+        """ Makes each of the given moves in turn. """
+        model = self._get_playing_model()
+        if not argument:
+            raise CommandError('no moves given')
+        success = True
+        for move in argument:
+            if self._get_status() != PLAYING:
+                break
+            if move not in DIRECTION_DELTAS or not model.attempt_move(move):
+                success = False
+                break
+        self._send_diff(reply)
+        self._send_state(reply)
+        return success
+
+    def _command_undo(self, argument: str, reply: list[str]) -> bool:
+        """ Undoes the last move or purchase. """
+        return self._replay_history(UNDO, reply)
+
+    def _command_redo(self, argument: str, reply: list[str]) -> bool:
+        """ Redoes the last undone move or purchase. """
+        return self._replay_history(REDO, reply)
+
+    def _command_buy(self, argument: str, reply: list[str]) -> bool:
+        """ Buys the given shop item. """
+        model = self._get_playing_model()
+        if argument not in model.get_shop_items():
+            raise CommandError(f'no shop item {argument!r}')
+        success = model.attempt_purchase(argument)
+        self._send_state(reply)
+        return success
+
+    def _command_reset(self, argument: str, reply: list[str]) -> bool:
+        """ Restarts the current level. """
+        self._get_model().reset()
+        self._send_board(reply)
+        self._send_state(reply)
+        return True
+
+    def _command_board(self, argument: str, reply: list[str]) -> bool:
+        """ Sends the whole board. """
+        self._get_model()
+        self._send_board(reply)
+        return True
+
+    def _command_state(self, argument: str, reply: list[str]) -> bool:
+        """ Sends the player's stats. """
+        self._get_model()
+        self._send_state(reply)
+        return True
+
+    def _replay_history(self, move: str, reply: list[str]) -> bool:
+        """ Undoes or redoes an action and sends the changes.
+
+        Parameters:
+            move: UNDO or REDO.
+            reply: The reply lines to add to.
+        """
+        success = self._get_model().attempt_move(move)
+        self._send_diff(reply)
+        self._send_state(reply)
+        return success
+
+    def _get_model(self) -> SokobanModel:
+        """ Returns the session's model, or raises CommandError if no level is
+            loaded.
+        """
+        if self._model is None:
+            raise CommandError('no level loaded')
+        return self._model
+
+    def _get_playing_model(self) -> SokobanModel:
+        """ Returns the session's model, or raises CommandError if the game is
+            over.
+        """
+        model = self._get_model()
+        if self._get_status() != PLAYING:
+            raise CommandError('game over')
+        return model
+
+    def _get_status(self) -> str:
+        """ Returns whether the game is being played, won or lost. """
+        model = self._model
+        if model.has_won():
+            return WON
+        if model.get_player_moves_remaining() <= 0 or model.is_deadlocked():
+            return LOST
+        return PLAYING
+
+    def _draw_cell(self, position: Position) -> str:
+        """ Returns the character drawn at the given position. """
+        if position == self._model.get_player_position():
+            return PLAYER
+        entity = self._model.get_entities().get(position)
+        if entity is not None:
+            return str(entity)
+        row, col = position
+        return str(self._model.get_maze()[row][col])
+
+    def _send_board(self, reply: list[str]) -> None:
+        """ Adds the whole board to the reply. """
+        rows, cols = self._model.get_dimensions()
+        self._board = [[self._draw_cell((row, col)) for col in range(cols)]
+                       for row in range(rows)]
+        # The whole board is up to date, so earlier changes need not be sent
+        self._model.pop_changed_cells()
+        reply.append(f'board {rows} {cols}')
+        reply.extend(''.join(row) for row in self._board)
+
+    def _send_diff(self, reply: list[str]) -> None:
+        """ Adds the cells which differ from the board last sent to the reply,
+            if there are any. Only the cells the model reports as changed
+            since then are compared.
+
+        Parameters:
+            reply: The reply lines to add to.
+        """
+        cells = self._model.pop_changed_cells()
+        if cells is None:
+            rows, cols = self._model.get_dimensions()
+            cells = [(row, col) for row in range(rows) for col in range(cols)]
+        changes = []
+        for row, col in sorted(cells):
+            char = self._draw_cell((row, col))
+            if self._board[row][col] != char:
+                self._board[row][col] = char
+                changes.append(f'{row},{col},{char}')
+        if changes:
+            reply.append('diff ' + ' '.join(changes))
+
+    def _send_state(self, reply: list[str]) -> None:
+        """ Adds the player's stats and the game status to the reply. """
+        model = self._model
+        reply.append(f'state {model.get_player_moves_remaining()} '
+                     f'{model.get_player_strength()} '
+                     f'{model.get_player_money()} {self._get_status()}')
+
+
+class SokobanServer:
+    """ Serves GameSessions over TCP or a Unix socket, one per connection. """
+
+    def __init__(
+        self,
+        maze_dir: str = DEFAULT_MAZE_DIR,
+        pool: ModelPool | None = None
+    ) -> None:
+        """ Constructor for SokobanServer.
+
+        Parameters:
+            maze_dir: The directory levels are loaded from.
+            pool: The pool of models shared by all sessions. If None, a pool
+                    with the default limits is used.
+        """
+        self._maze_dir = maze_dir
+        self._pool = ModelPool() if pool is None else pool
+        self._session_count = 0
+
+    def get_session_count(self) -> int:
+        """ Returns the number of sessions currently connected. """
+        return self._session_count
+
+    async def start(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        unix_path: str | None = None
+    ) -> asyncio.AbstractServer:
+        """ Starts listening for connections.
+
+        Parameters:
+            host: The address to listen on over TCP.
+            port: The TCP port to listen on.
+            unix_path: If given, listen on a Unix socket at this path instead
+                        of over TCP.
+
+        Returns:
+            The listening server.
+        """
+        if unix_path is not None:
+            return await asyncio.start_unix_server(
+                self.handle_connection, unix_path, limit=MAX_LINE)
+        return await asyncio.start_server(
+            self.handle_connection, host, port, limit=MAX_LINE)
+
+    async def handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> None:
+        """ Runs one session until the client quits or disconnects.
+
+        Parameters:
+            reader: The stream commands are read from.
+            writer: The stream replies are written to.
+        """
+        session = GameSession(self._maze_dir, self._pool)
+        self._session_count += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line was longer than MAX_LINE
+                    writer.write(b'error line too long\n')
+                    break
+                if not line:
+                    break
+                command = line.decode('utf-8', 'replace').strip()
+                if command == 'quit':
+                    writer.write(f'{OK}\n'.encode())
+                    break
+                if command:
+                    reply = session.handle_command(command)
+                    writer.write(('\n'.join(reply) + '\n').encode())
+                    # Wait for slow clients, rather than buffering without
+                    # limit
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            session.close()
+            self._session_count -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(args: argparse.Namespace) -> None:
+    """ Runs the server with the command line options until interrupted. """
+    server = await SokobanServer(args.maze_dir).start(
+        args.host, args.port, args.unix)
+    addresses = ', '.join(str(socket.getsockname())
+                          for socket in server.sockets)
+    print(f'Serving Sokoban on {addresses}')
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    """ Starts the server on the address given on the command line. """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='address to listen on over TCP')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='TCP port to listen on')
+    parser.add_argument('--unix', metavar='PATH',
+                        help='listen on a Unix socket instead of over TCP')
+    parser.add_argument('--maze-dir', default=DEFAULT_MAZE_DIR,
+                        help='directory to load levels from')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
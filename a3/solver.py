@@ -0,0 +1,437 @@
+import heapq
+import time
+import tracemalloc
+from collections import deque
+from typing import NamedTuple
+
+from a2_support import *
+from model import COIN, COIN_AMOUNT, DIRECTIONS, ENTITY_IDS_TO_CLASS, \
+    NO_CELL, TILE_IDS_TO_CODE, SokobanModel, build_neighbour_tables, \
+    convert_maze, find_dead_squares
+
+# A search state is a tuple of (player index, crates, items, filled goals,
+# strength, moves remaining, money). Crates are a sorted tuple of
+# (index, strength) pairs, and items and filled goals are bitmasks over the
+# level's item and goal lists.
+State = tuple[int, tuple[tuple[int, int], ...], int, int, int, int, int]
+
+
+class SolveResult(NamedTuple):
+    """ The outcome of a search for a winning sequence of actions. """
+    # The shortest winning sequence of moves (UP, DOWN, LEFT or RIGHT) and
+    # purchases (the item ids of SokobanModel.ITEM_COSTS), or None if the
+    # level cannot be won within its move budget.
+    solution: str | None
+    nodes_expanded: int
+    seconds: float
+    # The peak memory allocated during the search, in bytes, or None if
+    # memory was not measured.
+    peak_memory: int | None
+
+
+class SokobanSolver:
+    """ Finds shortest winning action sequences for a Sokoban level with A*.
+
+    Search follows the rules of SokobanModel: crates can only be pushed by a
+    player at least as strong as the crate, potions and coins are consumed by
+    walking onto them, shop items can be bought at any time, and the player
+    loses when their moves run out. Moves cost one each and purchases are
+    free, so the solution found uses the fewest moves.
+    """
+
+    def __init__(
+        self,
+        maze_file: str | None = None,
+        level: tuple[list[list[str]], list[int]] | None = None
+    ) -> None:
+        """ Constructor for SokobanSolver. Exactly one of maze_file and level
+            should be given.
+
+        Parameters:
+            maze_file: The path to the maze file (e.g. 'maze_files/maze1.txt')
+            level: An already read (raw maze, player stats) pair, e.g. from
+                    maze_pack.iter_levels.
+        """
+        raw_maze, player_stats = level or read_file(maze_file)
+        maze, entities, player_position = convert_maze(raw_maze)
+        self._rows, self._cols = len(maze), len(maze[0])
+
+        tiles = bytearray(TILE_IDS_TO_CODE[tile.get_type()]
+                          for row in maze for tile in row)
+        self._goals = []
+        filled = 0
+        for index, tile in enumerate(tile for row in maze for tile in row):
+            if tile.get_type() == GOAL:
+                if tile.is_filled():
+                    filled |= 1 << len(self._goals)
+                self._goals.append(index)
+        self._goal_bits = {index: 1 << i for i, index in enumerate(self._goals)}
+
+        self._neighbours, self._push_targets = build_neighbour_tables(
+            tiles, self._cols)
+
+        crates = []
+        self._items = []
+        for (row, col), entity in entities.items():
+            index = row * self._cols + col
+            if entity.get_type() == CRATE:
+                crates.append((index, entity.get_strength()))
+            else:
+                self._items.append((index, entity))
+        self._item_bits = {index: 1 << i
+                           for i, (index, _) in enumerate(self._items)}
+
+        self._purchases = [
+            (item, cost, ENTITY_IDS_TO_CLASS[item].EFFECT)
+            for item, cost in SokobanModel.ITEM_COSTS.items()
+        ]
+        self._goal_distances = [self._distances_from(goal)
+                                for goal in self._goals]
+        # The pushes which move a crate closer to its nearest goal, as
+        # (crate index, index the player pushes from) pairs
+        nearest_goal = [min(distances)
+                        for distances in zip(*self._goal_distances)]
+        if not self._goals:
+            # No push can help, and the level is already won
+            nearest_goal = [float('inf')] * (self._rows * self._cols)
+        self._useful_pushes = {}
+        for d, table in enumerate(self._neighbours):
+            for index, beyond in enumerate(table):
+                behind = self._neighbours[d ^ 1][index]
+                if (beyond != NO_CELL and behind != NO_CELL
+                        and nearest_goal[beyond] < nearest_goal[index]):
+                    self._useful_pushes.setdefault(index, []).append(behind)
+        self._dead_squares = find_dead_squares(tiles, self._cols, [
+            index for i, index in enumerate(self._goals)
+            if not filled & (1 << i)
+        ])
+
+        self._start = (
+            player_position[0] * self._cols + player_position[1],
+            tuple(sorted(crates)),
+            (1 << len(self._items)) - 1,
+            filled,
+            *player_stats,
+            0,
+        )
+
+    def get_dimensions(self) -> tuple[int, int]:
+        """ Returns the dimensions of the level as (#rows, #columns). """
+        return self._rows, self._cols
+
+    def get_start(self) -> State:
+        """ Returns the initial search state of the level. """
+        return self._start
+
+    def get_model_state(self, model: SokobanModel) -> State:
+        """ Returns the search state matching a model's current state. The
+            model must be playing the level this solver was built for, though
+            it may be part way through the game, or a ValueError is raised.
+
+        Parameters:
+            model: The model to read the state from.
+        """
+        if model.get_dimensions() != (self._rows, self._cols):
+            raise ValueError('the model is playing a different level')
+        crates = []
+        items = 0
+        remaining = {index: entity for index, entity in self._items}
+        for (row, col), entity in model.get_entities().items():
+            index = row * self._cols + col
+            if entity.get_type() == CRATE:
+                crates.append((index, entity.get_strength()))
+            elif (index in remaining
+                  and remaining[index].get_type() == entity.get_type()):
+                items |= self._item_bits[index]
+            else:
+                raise ValueError(f'no {entity} starts at {(row, col)}')
+
+        unfilled = model.get_unfilled_goal_positions()
+        filled = 0
+        for i, index in enumerate(self._goals):
+            if divmod(index, self._cols) not in unfilled:
+                filled |= 1 << i
+
+        row, col = model.get_player_position()
+        return (
+            row * self._cols + col,
+            tuple(sorted(crates)),
+            items,
+            filled,
+            model.get_player_strength(),
+            model.get_player_moves_remaining(),
+            model.get_player_money(),
+        )
+
+    def solve(
+        self,
+        max_nodes: int | None = None,
+        measure_memory: bool = True,
+        start: State | None = None,
+        time_limit: float | None = None
+    ) -> SolveResult:
+        """ Searches for the shortest winning sequence of actions.
+
+        Parameters:
+            max_nodes: The maximum number of states to expand before giving up,
+                        or None for no limit.
+            measure_memory: If True, trace allocations to report peak memory.
+                            This slows the search down noticeably.
+            start: The state to search from, e.g. from get_model_state, or
+                    None for the start of the level.
+            time_limit: The most seconds to search for before giving up, or
+                        None for no limit.
+
+        Returns:
+            The result of the search. The solution is None if the level cannot
+            be won, or if max_nodes or time_limit was reached first.
+        """
+        started_tracing = measure_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if measure_memory:
+            tracemalloc.reset_peak()
+        start_time = time.perf_counter()
+        deadline = None if time_limit is None else start_time + time_limit
+
+        if start is None:
+            start = self._start
+        best_cost = {start: 0}
+        parents = {start: None}
+        estimate = self.estimate(start)
+        frontier = [] if estimate is None else [(estimate, 0, 0, start)]
+        pushed = 1
+        expanded = 0
+        solution = None
+
+        while frontier:
+            _, cost, _, state = heapq.heappop(frontier)
+            if cost > best_cost[state]:
+                continue
+            if self.is_won(state):
+                solution = self._get_path(parents, state)
+                break
+            if max_nodes is not None and expanded >= max_nodes:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            expanded += 1
+
+            for action, step_cost, child in self.get_successors(state):
+                child_cost = cost + step_cost
+                if child_cost >= best_cost.get(child, child_cost + 1):
+                    continue
+                estimate = self.estimate(child)
+                if estimate is None:
+                    continue
+                best_cost[child] = child_cost
+                parents[child] = (state, action)
+                heapq.heappush(
+                    frontier,
+                    (child_cost + estimate, child_cost, pushed, child)
+                )
+                pushed += 1
+
+        seconds = time.perf_counter() - start_time
+        peak_memory = None
+        if measure_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        if started_tracing:
+            tracemalloc.stop()
+        return SolveResult(solution, expanded, seconds, peak_memory)
+
+    def get_successors(self, state: State) -> list[tuple[str, int, State]]:
+        """ Returns the (action, cost, next state) for every action which
+            succeeds from the given state.
+
+        Parameters:
+            state: The state to expand. The player must have moves remaining.
+        """
+        player, crates, items, filled, strength, moves, money = state
+        crate_strengths = dict(crates)
+        successors = []
+
+        for d, table in enumerate(self._neighbours):
+            target = table[player]
+            if target == NO_CELL:
+                continue
+
+            new_crates, new_items, new_filled = crates, items, filled
+            new_strength, new_money = strength, money
+            new_moves = moves - 1
+
+            crate = crate_strengths.get(target)
+            if crate is not None:
+                beyond = self._push_targets[d][player]
+                if (beyond == NO_CELL or beyond in crate_strengths
+                        or items & self._item_bits.get(beyond, 0)
+                        or crate > strength):
+                    continue
+                new_crates = [pair for pair in crates if pair[0] != target]
+                goal_bit = self._goal_bits.get(beyond, 0)
+                if goal_bit and not filled & goal_bit:
+                    new_filled = filled | goal_bit
+                else:
+                    new_crates.append((beyond, crate))
+                new_crates = tuple(sorted(new_crates))
+
+            item_bit = self._item_bits.get(target, 0)
+            if items & item_bit:
+                new_items = items & ~item_bit
+                entity = self._items[item_bit.bit_length() - 1][1]
+                if entity.get_type() == COIN:
+                    new_money += COIN_AMOUNT
+                else:
+                    effect = entity.effect()
+                    new_strength += effect.get('strength', 0)
+                    new_moves += effect.get('moves', 0)
+
+            successors.append((DIRECTIONS[d], 1, (
+                target, new_crates, new_items, new_filled, new_strength,
+                new_moves, new_money,
+            )))
+
+        for item, cost, effect in self._purchases:
+            if money >= cost:
+                successors.append((item, 0, (
+                    player, crates, items, filled,
+                    strength + effect.get('strength', 0),
+                    moves + effect.get('moves', 0),
+                    money - cost,
+                )))
+        return successors
+
+    def estimate(self, state: State) -> int | None:
+        """ Returns a lower bound on the moves needed to win from the given
+            state, or None if the state cannot lead to a win (including when
+            too few crates are off dead squares to fill the remaining goals).
+
+            Each unfilled goal needs a different crate pushed onto it, so the
+            sum over unfilled goals of the distance to the nearest crate never
+            overestimates the number of pushes still needed.
+
+        Parameters:
+            state: The state to estimate.
+        """
+        _, crates, items, filled, _, moves, money = state
+        unfilled = len(self._goals) - bin(filled).count('1')
+        if sum(not self._dead_squares[index] for index, _ in crates) < unfilled:
+            return None
+
+        estimate = 0
+        for i, distances in enumerate(self._goal_distances):
+            if filled & (1 << i):
+                continue
+            nearest = min((distances[index] for index, _ in crates),
+                          default=None)
+            if nearest is None:
+                return None
+            estimate += nearest
+
+        if estimate == 0:
+            return 0
+        if moves <= 0 or estimate > moves + self._extra_moves(items, money):
+            return None
+        return estimate
+
+    def _extra_moves(self, items: int, money: int) -> int:
+        """ Returns an upper bound on the moves the player could still gain
+            from the remaining potions and coins and from the shop.
+
+        Parameters:
+            items: The bitmask of remaining items.
+            money: The player's money.
+        """
+        extra = 0
+        for i, (_, entity) in enumerate(self._items):
+            if items & (1 << i):
+                if entity.get_type() == COIN:
+                    money += COIN_AMOUNT
+                else:
+                    extra += entity.effect().get('moves', 0)
+        return extra + max(money // cost * effect.get('moves', 0)
+                           for _, cost, effect in self._purchases)
+
+    def get_push_walk(self, state: State) -> int:
+        """ Returns the Manhattan distance from the player to the nearest cell
+            they could push a crate closer to a goal from, or 0 if there is no
+            such push. Added to the estimate, this helps to tell apart states
+            the estimate scores equally, though it is not a lower bound.
+
+        Parameters:
+            state: The state to measure.
+        """
+        player, crates = state[0], state[1]
+        row, col = divmod(player, self._cols)
+        walk = None
+        for index, _ in crates:
+            for behind in self._useful_pushes.get(index, ()):
+                behind_row, behind_col = divmod(behind, self._cols)
+                distance = abs(behind_row - row) + abs(behind_col - col)
+                if walk is None or distance < walk:
+                    walk = distance
+        return walk or 0
+
+    def is_won(self, state: State) -> bool:
+        """ Returns True iff every goal is filled in the given state. """
+        return state[3] == (1 << len(self._goals)) - 1
+
+    def _get_path(self, parents: dict, state: State) -> str:
+        """ Returns the actions leading from the start to the given state.
+
+        Parameters:
+            parents: Maps each reached state to its (parent, action), or None
+                        for the start state.
+            state: The final state.
+        """
+        actions = []
+        while parents[state] is not None:
+            state, action = parents[state]
+            actions.append(action)
+        return ''.join(reversed(actions))
+
+    def _distances_from(self, goal: int) -> list[float]:
+        """ Returns the walking distance from every cell to the given goal,
+            ignoring entities. Unreachable cells have an infinite distance.
+
+        Parameters:
+            goal: The index of the goal.
+        """
+        distances = [float('inf')] * (self._rows * self._cols)
+        distances[goal] = 0
+        queue = deque([goal])
+        while queue:
+            index = queue.popleft()
+            for table in self._neighbours:
+                neighbour = table[index]
+                if neighbour != NO_CELL and distances[neighbour] > \
+                        distances[index] + 1:
+                    distances[neighbour] = distances[index] + 1
+                    queue.append(neighbour)
+        return distances
+
+
+def solve(maze_file: str, max_nodes: int | None = None) -> SolveResult:
+    """ Returns the result of searching for the shortest winning sequence of
+        actions for the given maze file.
+
+    Parameters:
+        maze_file: The path to the maze file (e.g. 'maze_files/maze1.txt')
+        max_nodes: The maximum number of states to expand, or None for no limit.
+    """
+    return SokobanSolver(maze_file).solve(max_nodes)
+
+
+def main() -> None:
+    """ Solves each of the shipped mazes and prints the results. """
+    for maze_file in ('maze_files/maze1.txt', 'maze_files/maze2.txt',
+                      'maze_files/maze3.txt', 'maze_files/coin_maze.txt'):
+        result = solve(maze_file)
+        print(f'{maze_file}: solution={result.solution!r}, '
+              f'nodes={result.nodes_expanded}, '
+              f'time={result.seconds:.3f}s, '
+              f'peak_memory={result.peak_memory} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+""" Checks that BatchSokobanModel follows the same rules as SokobanModel.
+
+Run from the a3 directory, e.g.
+    python -m unittest test_batch_model
+"""
+import unittest
+
+import numpy as np
+
+from a2_support import *
+from batch_model import ACTIONS, NUM_MOVES, BatchSokobanModel
+from model import SokobanModel
+
+MAZE_FILES = ('maze_files/maze1.txt', 'maze_files/maze2.txt',
+              'maze_files/maze3.txt', 'maze_files/coin_maze.txt')
+
+
+def render(model: SokobanModel) -> str:
+    """ Returns the model's game as text, in the format of
+        BatchSokobanModel.render.
+    """
+    entities = model.get_entities()
+    lines = []
+    for row, tiles in enumerate(model.get_maze()):
+        line = []
+        for col, tile in enumerate(tiles):
+            if (row, col) == model.get_player_position():
+                line.append(PLAYER)
+            elif (row, col) in entities:
+                line.append(str(entities[(row, col)]))
+            else:
+                line.append(str(tile))
+        lines.append(''.join(line))
+    return '\n'.join(lines)
+
+
+class BatchModelTest(unittest.TestCase):
+    """ Steps a batch and one SokobanModel per game with the same seeded
+        random actions, and compares them after every step.
+    """
+
+    def test_matches_scalar_model(self):
+        maze_files = [MAZE_FILES[game % len(MAZE_FILES)] for game in range(40)]
+        batch = BatchSokobanModel(maze_files)
+        models = [SokobanModel(maze_file) for maze_file in maze_files]
+        rng = np.random.default_rng(0)
+
+        for step in range(120):
+            # Ids outside ACTIONS are included, and must always fail
+            actions = rng.integers(-1, len(ACTIONS) + 1, len(models))
+            succeeded = batch.step(actions)
+            for game, model in enumerate(models):
+                action = int(actions[game])
+                if 0 <= action < NUM_MOVES:
+                    expected = model.attempt_move(ACTIONS[action])
+                elif NUM_MOVES <= action < len(ACTIONS):
+                    expected = model.attempt_purchase(ACTIONS[action])
+                else:
+                    expected = False
+                self.assertEqual(bool(succeeded[game]), expected)
+                self.assertEqual(batch.render(game), render(model))
+                self.assertEqual(batch.get_player_position(game),
+                                 model.get_player_position())
+                self.assertEqual(
+                    (batch.get_player_strength()[game],
+                     batch.get_player_moves_remaining()[game],
+                     batch.get_player_money()[game],
+                     batch.has_won()[game]),
+                    (model.get_player_strength(),
+                     model.get_player_moves_remaining(),
+                     model.get_player_money(), model.has_won()))
+
+            if step == 60:
+                mask = rng.random(len(models)) < 0.5
+                batch.reset(mask)
+                for game in np.flatnonzero(mask):
+                    models[game].reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+""" Checks that following the hint agent's hints wins the shipped mazes.
+
+Run from the a3 directory, e.g.
+    python -m unittest test_hint_agent
+"""
+import unittest
+
+from a2_support import *
+from hint_agent import HintAgent
+from model import SokobanModel
+
+MAZE_FILES = ('maze_files/maze1.txt', 'maze_files/maze2.txt',
+              'maze_files/maze3.txt', 'maze_files/coin_maze.txt')
+
+# Generous, so the result does not depend on the speed of the machine
+BUDGET = 1.0
+
+
+class HintAgentTest(unittest.TestCase):
+    """ Plays each shipped maze by following hints. """
+
+    def test_following_hints_wins(self):
+        for maze_file in MAZE_FILES:
+            with self.subTest(maze_file=maze_file):
+                model = SokobanModel(maze_file)
+                agent = HintAgent(model, seed=0)
+                while not model.has_won():
+                    self.assertGreater(model.get_player_moves_remaining(), 0)
+                    hint = agent.get_hint(model, BUDGET)
+                    self.assertIsNotNone(hint)
+                    if hint in DIRECTION_DELTAS:
+                        self.assertTrue(model.attempt_move(hint))
+                    else:
+                        self.assertTrue(model.attempt_purchase(hint))
+                self.assertIsNone(agent.get_hint(model, BUDGET))
+
+
+if __name__ == '__main__':
+    unittest.main()
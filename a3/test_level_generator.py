@@ -0,0 +1,40 @@
+""" Checks that generated levels can be won, and that generation stops.
+
+Run from the a3 directory, e.g.
+    python -m unittest test_level_generator
+"""
+import unittest
+
+from a2_support import *
+from level_generator import GeneratorOptions, generate_levels
+from model import SokobanModel, build_maze_template
+
+
+class GenerateLevelsTest(unittest.TestCase):
+    """ Generates levels across worker processes. """
+
+    def test_levels_are_winnable_and_independent_of_workers(self):
+        levels = list(generate_levels(3, workers=2))
+        self.assertEqual(levels, list(generate_levels(3, workers=1)))
+        self.assertEqual([level.seed for level in levels],
+                         sorted(level.seed for level in levels))
+        for level in levels:
+            model = SokobanModel(template=build_maze_template(
+                level.raw_maze, level.player_stats))
+            for action in level.solution:
+                if action in DIRECTION_DELTAS:
+                    self.assertTrue(model.attempt_move(action))
+                else:
+                    self.assertTrue(model.attempt_purchase(action))
+            self.assertTrue(model.has_won())
+            self.assertGreaterEqual(model.get_player_moves_remaining(), 0)
+
+    def test_gives_up_after_max_seeds(self):
+        # Too many crates to fit in the maze
+        options = GeneratorOptions(crates=20)
+        with self.assertRaises(ValueError):
+            list(generate_levels(1, options, workers=1, max_seeds=20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+""" Checks that maze packs give back the levels written to them.
+
+Run from the a3 directory, e.g.
+    python -m unittest test_maze_pack
+"""
+import os
+import tempfile
+import unittest
+
+from a2_support import *
+from maze_pack import MazePack, PackError, compile_pack, compile_text_pack, \
+    iter_levels
+from model import SokobanModel
+
+MAZE_FILES = ('maze_files/maze1.txt', 'maze_files/maze2.txt',
+              'maze_files/maze3.txt', 'maze_files/coin_maze.txt')
+
+
+class MazePackTest(unittest.TestCase):
+    """ Round trips the shipped mazes through a pack. """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.pack_file = os.path.join(self.directory, 'levels.pack')
+
+    def test_round_trip(self):
+        self.assertEqual(compile_pack(MAZE_FILES, self.pack_file),
+                         len(MAZE_FILES))
+        with MazePack(self.pack_file) as pack:
+            self.assertEqual(len(pack), len(MAZE_FILES))
+            levels = [read_file(maze_file) for maze_file in MAZE_FILES]
+            self.assertEqual(list(pack), levels)
+            for level, maze_file in enumerate(MAZE_FILES):
+                self.assertEqual(pack.get_level(level), levels[level])
+                model = pack.create_model(level)
+                expected = SokobanModel(maze_file)
+                self.assertEqual(model.get_player_position(),
+                                 expected.get_player_position())
+                self.assertEqual(
+                    {position: str(entity) for position, entity
+                     in model.get_entities().items()},
+                    {position: str(entity) for position, entity
+                     in expected.get_entities().items()})
+            with self.assertRaises(IndexError):
+                pack.get_level(len(MAZE_FILES))
+
+    def test_text_pack_round_trip(self):
+        levels = [read_file(maze_file) for maze_file in MAZE_FILES]
+        text_pack_file = os.path.join(self.directory, 'levels.txt')
+        with open(text_pack_file, 'w') as file:
+            for raw_maze, player_stats in levels:
+                # Extra blank lines between levels are ignored
+                file.write('\n\n' + ' '.join(map(str, player_stats)) + '\n')
+                file.writelines(''.join(row) + '\n' for row in raw_maze)
+        self.assertEqual(list(iter_levels(text_pack_file)), levels)
+
+        self.assertEqual(compile_text_pack(text_pack_file, self.pack_file),
+                         len(levels))
+        with MazePack(self.pack_file) as pack:
+            self.assertEqual(list(pack), levels)
+
+    def test_not_a_pack(self):
+        with open(self.pack_file, 'wb') as file:
+            file.write(b'not a maze pack at all')
+        with self.assertRaises(PackError):
+            MazePack(self.pack_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+""" Regression checks for the model.
+
+Run from the a3 directory, e.g.
+    python -m unittest test_model
+"""
+import os
+import tempfile
+import unittest
+
+from model import SokobanModel
+
+# A shortest win for maze1, which pushes its crate onto the goal
+MAZE1 = 'maze_files/maze1.txt'
+MAZE1_SOLUTION = 'sdsasdddsdw'
+
+
+def write_level(directory: str, rows: list[str], player_stats: list[int]
+                ) -> str:
+    """ Writes a level given as rows of maze characters to a maze file in the
+        given directory, and returns its path.
+    """
+    maze_file = os.path.join(directory, 'level.txt')
+    with open(maze_file, 'w') as file:
+        file.write(' '.join(str(stat) for stat in player_stats) + '\n')
+        file.writelines(row + '\n' for row in rows)
+    return maze_file
+
+
+def snapshot(model: SokobanModel) -> tuple:
+    """ Returns everything a player can see of the model's state. """
+    return (
+        model.get_player_position(),
+        {position: str(entity)
+         for position, entity in model.get_entities().items()},
+        [[str(tile) for tile in row] for row in model.get_maze()],
+        model.get_player_strength(),
+        model.get_player_moves_remaining(),
+        model.get_player_money(),
+    )
+
+
+class UndoTest(unittest.TestCase):
+    """ Checks undoing and redoing any number of actions. """
+
+    def test_undo_and_redo_round_trip(self):
+        model = SokobanModel(MAZE1)
+        states = [snapshot(model)]
+        for move in MAZE1_SOLUTION:
+            self.assertTrue(model.attempt_move(move))
+            states.append(snapshot(model))
+        self.assertTrue(model.has_won())
+
+        for state in reversed(states[:-1]):
+            self.assertTrue(model.undo_move())
+            self.assertEqual(snapshot(model), state)
+        self.assertFalse(model.can_undo())
+        self.assertFalse(model.undo_move())
+
+        for state in states[1:]:
+            self.assertTrue(model.redo_move())
+            self.assertEqual(snapshot(model), state)
+        self.assertFalse(model.can_redo())
+        self.assertTrue(model.has_won())
+
+    def test_new_move_clears_redo(self):
+        model = SokobanModel(MAZE1)
+        self.assertTrue(model.attempt_move('s'))
+        self.assertTrue(model.attempt_move('d'))
+        self.assertTrue(model.undo_move())
+        self.assertTrue(model.can_redo())
+
+        self.assertTrue(model.attempt_move('s'))
+        self.assertFalse(model.can_redo())
+        self.assertFalse(model.redo_move())
+        self.assertEqual(model.get_player_position(), (3, 1))
+
+
+class StateHashTest(unittest.TestCase):
+    """ Checks that the incrementally kept state hash tracks the state. """
+
+    def test_hash_restored_by_undo(self):
+        model = SokobanModel(MAZE1)
+        hashes = [model.state_hash()]
+        for move in MAZE1_SOLUTION:
+            self.assertTrue(model.attempt_move(move))
+            hashes.append(model.state_hash())
+        self.assertEqual(len(set(hashes)), len(hashes))
+
+        for state_hash in reversed(hashes[:-1]):
+            self.assertTrue(model.undo_move())
+            self.assertEqual(model.state_hash(), state_hash)
+        self.assertEqual(model.state_hash(), SokobanModel(MAZE1).state_hash())
+
+    def test_equal_states_have_equal_hashes(self):
+        first, second = SokobanModel(MAZE1), SokobanModel(MAZE1)
+        for move in 'sd':
+            self.assertTrue(first.attempt_move(move))
+        for move in 'ds':
+            self.assertTrue(second.attempt_move(move))
+        self.assertEqual(snapshot(first), snapshot(second))
+        self.assertEqual(first.state_hash(), second.state_hash())
+
+
+
+class DeadlockTest(unittest.TestCase):
+    """ Checks that is_deadlocked never reports a winnable game as lost. """
+
+    # The crate at (2, 4) has dead squares above and below it, but can be
+    # pushed onto one of them, which frees the crate at (1, 4)
+    SURPLUS_CRATES = [
+        'WWWWWWW',
+        'W   1 W',
+        'W  W1 W',
+        'W1WW PW',
+        'W G   W',
+        'WWWWWWW',
+    ]
+
+    def test_crate_between_dead_squares_does_not_freeze_neighbours(self):
+        with tempfile.TemporaryDirectory() as directory:
+            model = SokobanModel(
+                write_level(directory, self.SURPLUS_CRATES, [1, 200]))
+        self.assertFalse(model.is_deadlocked())
+        for move in 'wwassdsaa':
+            self.assertTrue(model.attempt_move(move))
+            self.assertFalse(model.is_deadlocked())
+        self.assertTrue(model.has_won())
+
+    def test_crate_against_wall_is_deadlocked(self):
+        model = SokobanModel(MAZE1)
+        self.assertFalse(model.is_deadlocked())
+        # Pushes the only crate against the bottom wall, away from the goal
+        for move in 'sdss':
+            self.assertTrue(model.attempt_move(move))
+        self.assertTrue(model.is_deadlocked())
+        self.assertTrue(model.undo_move())
+        self.assertFalse(model.is_deadlocked())
+
+
+
+def draw(model: SokobanModel) -> dict[tuple[int, int], str]:
+    """ Returns the character drawn at each cell of the model's maze. """
+    entities = model.get_entities()
+    cells = {}
+    for row, tiles in enumerate(model.get_maze()):
+        for col, tile in enumerate(tiles):
+            cells[(row, col)] = str(entities.get((row, col), tile))
+    cells[model.get_player_position()] = 'P'
+    return cells
+
+
+class ChangedCellsTest(unittest.TestCase):
+    """ Checks the cells reported by pop_changed_cells. """
+
+    def test_reports_the_cells_each_action_changes(self):
+        model = SokobanModel(MAZE1)
+        # Everything may have changed since the model was built
+        self.assertIsNone(model.pop_changed_cells())
+        self.assertEqual(model.pop_changed_cells(), set())
+
+        self.assertTrue(model.attempt_move('s'))
+        self.assertEqual(model.pop_changed_cells(), {(1, 1), (2, 1)})
+        self.assertFalse(model.attempt_move('a'))
+        self.assertEqual(model.pop_changed_cells(), set())
+
+        # Pushes the crate down from (3, 2) to (4, 2)
+        self.assertTrue(model.attempt_move('d'))
+        model.pop_changed_cells()
+        self.assertTrue(model.attempt_move('s'))
+        self.assertEqual(model.pop_changed_cells(), {(2, 2), (3, 2), (4, 2)})
+        self.assertTrue(model.undo_move())
+        self.assertEqual(model.pop_changed_cells(), {(2, 2), (3, 2), (4, 2)})
+
+        model.reset()
+        self.assertIsNone(model.pop_changed_cells())
+
+    def test_changes_accumulate_until_popped(self):
+        model = SokobanModel(MAZE1)
+        model.pop_changed_cells()
+        before = draw(model)
+        for action in MAZE1_SOLUTION[:6] + 'uu' + 'r':
+            if action == 'u':
+                self.assertTrue(model.undo_move())
+            elif action == 'r':
+                self.assertTrue(model.redo_move())
+            else:
+                self.assertTrue(model.attempt_move(action))
+        after = draw(model)
+        changed = {cell for cell in after if after[cell] != before[cell]}
+        self.assertTrue(changed <= model.pop_changed_cells())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+""" Checks that ModelPool reuses, resets and evicts models.
+
+Run from the a3 directory, e.g.
+    python -m unittest test_model_pool
+"""
+import unittest
+
+from model import SokobanModel, load_maze_template
+from model_pool import ModelPool
+from test_model import MAZE1, MAZE1_SOLUTION, snapshot
+
+MAZE2 = 'maze_files/maze2.txt'
+
+
+class FakeClock:
+    """ A clock which only moves when told to. """
+
+    def __init__(self) -> None:
+        """ Constructor for FakeClock, starting at time 0. """
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """ Returns the current time in seconds. """
+        return self.now
+
+
+class ModelPoolTest(unittest.TestCase):
+    """ Checks acquiring, releasing and evicting pooled models. """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pool = ModelPool(max_idle=2, idle_timeout=10.0, clock=self.clock)
+
+    def test_released_model_is_reset_and_reused(self):
+        model = self.pool.acquire(MAZE1)
+        for move in MAZE1_SOLUTION:
+            self.assertTrue(model.attempt_move(move))
+        self.assertTrue(model.has_won())
+        self.pool.release(model)
+        # Releasing twice keeps one copy
+        self.pool.release(model)
+        self.assertEqual(len(self.pool), 1)
+
+        reused = self.pool.acquire(template=load_maze_template(MAZE1))
+        self.assertIs(reused, model)
+        self.assertEqual(snapshot(reused), snapshot(SokobanModel(MAZE1)))
+        self.assertFalse(reused.has_won())
+        self.assertFalse(reused.can_undo())
+        self.assertEqual(self.pool.get_stats(), {
+            'hits': 1, 'misses': 1, 'evictions': 0, 'idle': 0})
+
+    def test_models_are_only_reused_for_their_template(self):
+        self.pool.release(self.pool.acquire(MAZE1))
+        model = self.pool.acquire(MAZE2)
+        self.assertEqual(model.get_dimensions(),
+                         SokobanModel(MAZE2).get_dimensions())
+        self.assertEqual(self.pool.get_stats()['misses'], 2)
+        self.assertEqual(len(self.pool), 1)
+
+    def test_least_recently_released_is_evicted_when_full(self):
+        models = [self.pool.acquire(MAZE1) for _ in range(3)]
+        for model in models:
+            self.pool.release(model)
+        self.assertEqual(len(self.pool), 2)
+        self.assertEqual(self.pool.get_stats()['evictions'], 1)
+        reused = {self.pool.acquire(MAZE1) for _ in range(2)}
+        self.assertEqual(reused, set(models[1:]))
+
+    def test_idle_models_time_out(self):
+        self.pool.release(self.pool.acquire(MAZE1))
+        self.clock.now = 5.0
+        self.pool.release(self.pool.acquire(MAZE2))
+        self.clock.now = 12.0
+        self.assertEqual(self.pool.evict_idle(), 1)
+        self.assertEqual(len(self.pool), 1)
+        self.clock.now = 20.0
+        self.pool.acquire(MAZE2)
+        self.assertEqual(self.pool.get_stats(), {
+            'hits': 0, 'misses': 3, 'evictions': 2, 'idle': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+""" Checks the game server's protocol, driven through GameSession.
+
+Run from the a3 directory, e.g.
+    python -m unittest test_server
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from server import GameSession
+
+MAZE1_SOLUTION = 'sdsasdddsdw'
+
+
+def apply_reply(board: list[list[str]], reply: list[str]) -> None:
+    """ Updates a client's copy of the board from the lines of a reply. """
+    for line in reply:
+        if line.startswith('board '):
+            rows = int(line.split()[1])
+            start = reply.index(line) + 1
+            board[:] = [list(row) for row in reply[start:start + rows]]
+        elif line.startswith('diff '):
+            # Cells are separated by single spaces, and a char may be a space
+            cells = line[len('diff '):]
+            while cells:
+                row, col, cells = cells.split(',', 2)
+                board[int(row)][int(col)] = cells[0]
+                cells = cells[2:]
+
+
+class GameSessionTest(unittest.TestCase):
+    """ Plays games through the line protocol. """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.maze_dir = directory.name
+        shutil.copy('maze_files/maze1.txt', self.maze_dir)
+        self.session = GameSession(self.maze_dir)
+
+    def write_level(self, name: str, text: str) -> None:
+        """ Writes a level file into the session's maze directory. """
+        with open(os.path.join(self.maze_dir, name + '.txt'), 'w') as file:
+            file.write(text)
+
+    def test_diffs_keep_the_client_board_up_to_date(self):
+        board = []
+        reply = self.session.handle_command('load maze1')
+        self.assertEqual(reply[-2:], ['state 12 1 0 playing', 'ok'])
+        apply_reply(board, reply)
+
+        for command in ['move sa', 'move a', 'undo', 'undo', 'redo',
+                        'move ' + MAZE1_SOLUTION[1:]]:
+            apply_reply(board, self.session.handle_command(command))
+        self.assertEqual(self.session.handle_command('state'),
+                         ['state 1 1 0 won', 'ok'])
+
+        expected = []
+        apply_reply(expected, self.session.handle_command('board'))
+        self.assertEqual(board, expected)
+
+    def test_failed_move_is_invalid(self):
+        self.session.handle_command('load maze1')
+        self.assertEqual(self.session.handle_command('move w'),
+                         ['state 12 1 0 playing', 'invalid'])
+
+    def test_bad_commands_are_errors(self):
+        for command in ['state', 'move d', 'load', 'load ../maze1',
+                        'load missing', 'bogus']:
+            with self.subTest(command=command):
+                reply = self.session.handle_command(command)
+                self.assertEqual(len(reply), 1)
+                self.assertTrue(reply[0].startswith('error '))
+
+    def test_malformed_levels_are_errors(self):
+        self.write_level('header', 'x y\nWWW\nWPW\nWWW\n')
+        self.write_level('empty', '')
+        self.write_level('no_player', '1 5\nWWW\nW W\nWWW\n')
+        self.write_level('unknown', '1 5\nWWWW\nWPZW\nWWWW\n')
+        for name in ['header', 'empty', 'no_player', 'unknown']:
+            with self.subTest(level=name):
+                reply = self.session.handle_command('load ' + name)
+                self.assertEqual(len(reply), 1)
+                self.assertTrue(reply[0].startswith(f"error level '{name}'"))
+        # The session is still usable afterwards
+        self.assertEqual(self.session.handle_command('load maze1')[-1], 'ok')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+""" Checks that the solver's solutions are wins for the model.
+
+Run from the a3 directory, e.g.
+    python -m unittest test_solver
+"""
+import os
+import tempfile
+import unittest
+
+from a2_support import *
+from model import SokobanModel, build_maze_template
+from solver import SokobanSolver
+
+MAZE_FILES = ('maze_files/maze1.txt', 'maze_files/maze2.txt',
+              'maze_files/maze3.txt', 'maze_files/coin_maze.txt')
+
+
+def replay(maze_file: str, solution: str) -> SokobanModel:
+    """ Returns a model for the given maze after playing the given actions,
+        failing if any action is rejected.
+    """
+    model = SokobanModel(maze_file)
+    for action in solution:
+        if action in DIRECTION_DELTAS:
+            succeeded = model.attempt_move(action)
+        else:
+            succeeded = model.attempt_purchase(action)
+        if not succeeded:
+            raise AssertionError(f'{action!r} failed in {solution!r}')
+    return model
+
+
+class SolverTest(unittest.TestCase):
+    """ Checks the solver on the shipped mazes and on edge cases. """
+
+    def test_solutions_replay_to_a_win(self):
+        for maze_file in MAZE_FILES:
+            with self.subTest(maze_file=maze_file):
+                solution = SokobanSolver(maze_file).solve(
+                    measure_memory=False).solution
+                self.assertIsNotNone(solution)
+                model = replay(maze_file, solution)
+                self.assertTrue(model.has_won())
+                self.assertGreaterEqual(model.get_player_moves_remaining(), 0)
+
+    def test_solves_from_a_later_state(self):
+        maze_file = 'maze_files/maze3.txt'
+        solver = SokobanSolver(maze_file)
+        model = replay(maze_file, 'sd')
+        rest = solver.solve(measure_memory=False,
+                            start=solver.get_model_state(model)).solution
+        self.assertTrue(replay(maze_file, 'sd' + rest).has_won())
+
+    def test_level_without_goals_is_already_won(self):
+        raw_maze = [list(row) for row in ['WWWWW', 'WP1 W', 'WWWWW']]
+        model = SokobanModel(template=build_maze_template(raw_maze, [1, 10]))
+        self.assertTrue(model.has_won())
+        solver = SokobanSolver(level=(raw_maze, [1, 10]))
+        self.assertEqual(solver.solve(measure_memory=False).solution, '')
+
+    def test_too_few_moves_has_no_solution(self):
+        # maze1 needs 11 moves
+        raw_maze, _ = read_file('maze_files/maze1.txt')
+        with tempfile.TemporaryDirectory() as directory:
+            maze_file = os.path.join(directory, 'tight.txt')
+            with open(maze_file, 'w') as file:
+                file.write('1 10\n')
+                file.writelines(''.join(row) + '\n' for row in raw_maze)
+            self.assertIsNone(SokobanSolver(maze_file).solve(
+                measure_memory=False).solution)
+
+
+if __name__ == '__main__':
+    unittest.main()
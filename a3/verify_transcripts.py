@@ -0,0 +1,253 @@
+""" Verifies game transcripts, like those in a2/game_examples, against the
+model.
+
+Run from the a3 directory, e.g.
+    python verify_transcripts.py ../a2/game_examples --workers 8
+
+A transcript is the text printed by a text based game of Sokoban: the board,
+the player's stats and an 'Enter move: ' prompt echoing the move entered, for
+every turn, followed by 'You won!' or 'You lost!'. The level is read from the
+first board and stats in the transcript, the moves are replayed through
+SokobanModel, and the text the game would have printed is compared line by
+line with the transcript. No view is used, so nothing is printed.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, NamedTuple
+
+from a2_support import *
+from model import UNDO, SokobanModel, build_maze_template
+
+PROMPT = 'Enter move: '
+QUIT = 'q'
+STATS_PREFIX = 'Moves remaining: '
+INVALID_MOVE = 'Invalid move'
+WON = 'You won!'
+LOST = 'You lost!'
+TRANSCRIPT_SUFFIX = '.txt'
+
+
+class TranscriptError(ValueError):
+    """ Raised when a transcript cannot be parsed. """
+
+
+class VerifyResult(NamedTuple):
+    """ The outcome of verifying one transcript. """
+    transcript: str
+    ok: bool
+    # The number of moves replayed
+    moves: int
+    # A description of the first difference, or '' if the transcript matched
+    message: str
+
+
+def parse_transcript(
+    lines: list[str]
+) -> tuple[list[list[str]], list[int], list[str]]:
+    """ Reads the level and the moves entered from a transcript.
+
+    Parameters:
+        lines: The lines of the transcript, without line endings.
+
+    Returns:
+        A tuple containing three items:
+            1) The raw maze, in the format returned by read_file.
+            2) The player's starting strength and moves remaining.
+            3) Every move entered, in order.
+    """
+    try:
+        board_end = lines.index('')
+    except ValueError:
+        raise TranscriptError('no blank line after the first board') from None
+    if board_end == 0 or not lines[board_end + 1:]:
+        raise TranscriptError('missing first board or stats')
+
+    stats = lines[board_end + 1]
+    if not stats.startswith(STATS_PREFIX):
+        raise TranscriptError(f'expected stats on line {board_end + 2}')
+    try:
+        moves, strength = stats[len(STATS_PREFIX):].split(', strength: ')
+        player_stats = [int(strength), int(moves)]
+    except ValueError:
+        raise TranscriptError(
+            f'malformed stats on line {board_end + 2}') from None
+
+    raw_maze = [list(line) for line in lines[:board_end]]
+    moves = [line[len(PROMPT):] for line in lines if line.startswith(PROMPT)]
+    return raw_maze, player_stats, moves
+
+
+def replay(
+    raw_maze: list[list[str]],
+    player_stats: list[int],
+    moves: list[str]
+) -> Iterator[str]:
+    """ Yields the lines the text based game prints when the given moves are
+        entered, in the same order and format as its play_game method, with
+        each prompt followed by the move entered.
+
+    Parameters:
+        raw_maze: The raw maze, in the format returned by read_file.
+        player_stats: The player's starting strength and moves remaining.
+        moves: The moves entered. Input after the game ends is ignored.
+    """
+    model = SokobanModel(template=build_maze_template(raw_maze, player_stats))
+    rows, cols = model.get_dimensions()
+
+    def display() -> Iterator[str]:
+        maze, entities = model.get_maze(), model.get_entities()
+        player_position = model.get_player_position()
+        for row in range(rows):
+            line = []
+            for col in range(cols):
+                if (row, col) == player_position:
+                    line.append(PLAYER)
+                else:
+                    line.append(str(entities.get((row, col), maze[row][col])))
+            yield ''.join(line)
+        yield ''
+        yield (f'{STATS_PREFIX}{model.get_player_moves_remaining()}, '
+               f'strength: {model.get_player_strength()}')
+        yield ''
+
+    entered = iter(moves)
+    while model.get_player_moves_remaining() > 0:
+        yield from display()
+        if model.has_won():
+            yield WON
+            return
+
+        move = next(entered, None)
+        if move is None:
+            # The transcript ends mid game
+            return
+        yield PROMPT + move
+        if move == QUIT:
+            return
+        if move == UNDO:
+            model.undo_move()
+        elif move not in DIRECTION_DELTAS or not model.attempt_move(move):
+            yield INVALID_MOVE
+            yield ''
+
+    if model.has_won():
+        yield from display()
+        yield WON
+    elif model.get_player_moves_remaining() == 0:
+        yield LOST
+
+
+def verify_transcript(transcript: str) -> VerifyResult:
+    """ Replays a transcript and compares it with the text the game prints.
+
+    Parameters:
+        transcript: The path to the transcript file.
+
+    Returns:
+        The result of the comparison. Transcripts which cannot be read or
+        parsed are reported as failures rather than raising.
+    """
+    try:
+        with open(transcript) as file:
+            lines = file.read().splitlines()
+        raw_maze, player_stats, moves = parse_transcript(lines)
+    except (OSError, TranscriptError) as error:
+        return VerifyResult(transcript, False, 0, str(error))
+
+    # Trailing blank lines are not significant
+    while lines and lines[-1] == '':
+        lines.pop()
+
+    line_number = 0
+    for line_number, expected in enumerate(
+            replay(raw_maze, player_stats, moves), start=1):
+        if line_number > len(lines):
+            return VerifyResult(transcript, False, len(moves),
+                                f'transcript ends early, expected '
+                                f'{expected!r} on line {line_number}')
+        if lines[line_number - 1] != expected:
+            return VerifyResult(transcript, False, len(moves),
+                                f'line {line_number}: expected {expected!r}, '
+                                f'got {lines[line_number - 1]!r}')
+    if line_number < len(lines):
+        return VerifyResult(transcript, False, len(moves),
+                            f'unexpected text on line {line_number + 1}: '
+                            f'{lines[line_number]!r}')
+    return VerifyResult(transcript, True, len(moves), '')
+
+
+def find_transcripts(paths: list[str]) -> list[str]:
+    """ Returns the transcript files at the given paths. Directories are
+        searched recursively for files ending in TRANSCRIPT_SUFFIX.
+
+    Parameters:
+        paths: Paths to transcript files or directories.
+    """
+    transcripts = []
+    for path in paths:
+        if not os.path.isdir(path):
+            transcripts.append(path)
+            continue
+        for directory, _, files in os.walk(path):
+            transcripts.extend(os.path.join(directory, name)
+                               for name in sorted(files)
+                               if name.endswith(TRANSCRIPT_SUFFIX))
+    return transcripts
+
+
+def verify_transcripts(
+    transcripts: list[str],
+    workers: int | None = None
+) -> list[VerifyResult]:
+    """ Verifies many transcripts across a pool of processes.
+
+    Parameters:
+        transcripts: The paths to the transcript files.
+        workers: The number of worker processes, or None for one per CPU. With
+                    1 worker, transcripts are verified in this process.
+
+    Returns:
+        The result for each transcript, in the order given.
+    """
+    if workers == 1 or len(transcripts) <= 1:
+        return [verify_transcript(transcript) for transcript in transcripts]
+
+    workers = workers or os.cpu_count() or 1
+    # Large chunks keep the cost of sending paths and results between
+    # processes small next to the cost of replaying
+    chunksize = max(1, len(transcripts) // (workers * 4))
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(verify_transcript, transcripts,
+                                 chunksize=chunksize))
+
+
+def main() -> None:
+    """ Verifies the transcripts given on the command line, and exits with a
+        non-zero status if any do not match.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+',
+                        help='transcript files or directories of transcripts')
+    parser.add_argument('--workers', type=int,
+                        help='number of worker processes (default: one per '
+                             'CPU)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='list every transcript, not only failures')
+    args = parser.parse_args()
+
+    results = verify_transcripts(find_transcripts(args.paths), args.workers)
+    failures = 0
+    for result in results:
+        if not result.ok:
+            failures += 1
+            print(f'FAIL {result.transcript}: {result.message}')
+        elif args.verbose:
+            print(f'ok   {result.transcript} ({result.moves} moves)')
+    print(f'{len(results) - failures} of {len(results)} transcripts passed')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()